@@ -0,0 +1,79 @@
+"""
+    用例内存基准，对比带__dict__的数据类、带__slots__的Case、以及共用键元组的参数
+    python -m webapitest.benchmarks.case_memory --cases 1000000
+"""
+import gc
+import argparse
+import tracemalloc
+from dataclasses import dataclass
+from ..src.base import Case
+
+
+@dataclass
+class DictCase:
+    """
+        改为__slots__之前的Case
+    """
+    name: str
+    params: dict
+    desc: str = None
+    response: list = None
+
+
+def gen_params(i, param_count, _keys={}):
+    # 同json.loads一样，各用例的键是同一批字符串对象
+    keys = _keys.setdefault(param_count, ['key%s' % k for k in range(param_count)])
+    return {key: 'value%s' % (i * param_count + k) for k, key in enumerate(keys)}
+
+
+def measure(build, case_count, param_count) -> int:
+    """
+        构建case_count个用例后仍被引用的内存字节数
+    """
+    gc.collect()
+    tracemalloc.start()
+    cases = build(case_count, param_count)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del cases
+    return size
+
+
+def build_dict_cases(case_count, param_count):
+    return [DictCase('case%s' % i, gen_params(i, param_count)) for i in range(case_count)]
+
+
+def build_slotted_cases(case_count, param_count):
+    return [Case('case%s' % i, gen_params(i, param_count)) for i in range(case_count)]
+
+
+def build_shared_key_cases(case_count, param_count):
+    key_table = {}
+    return [Case.from_dict({'name': 'case%s' % i, 'params': gen_params(i, param_count)}, key_table)
+            for i in range(case_count)]
+
+
+def run(case_count=1000000, param_count=4) -> dict:
+    return {
+        'cases': case_count,
+        'params': param_count,
+        'dict_bytes': measure(build_dict_cases, case_count, param_count),
+        'slots_bytes': measure(build_slotted_cases, case_count, param_count),
+        'shared_keys_bytes': measure(build_shared_key_cases, case_count, param_count),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--cases', type=int, default=1000000)
+    parser.add_argument('--params', type=int, default=4)
+    args = parser.parse_args()
+    res = run(args.cases, args.params)
+    print('cases=%(cases)s params=%(params)s' % res)
+    for key, label in (('dict_bytes', '__dict__:    '), ('slots_bytes', '__slots__:   '),
+                       ('shared_keys_bytes', 'shared keys: ')):
+        print('%s%.1fMB (%.0f bytes/case)' % (label, res[key] / 1024 / 1024, res[key] / res['cases']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+"""
+    Postman collection解码/编码基准，对比from_union逐个尝试的from_dict/to_dict与按注解生成的解码表/编码表
+    post_man/collection.json是collection的schema，这里按schema生成覆盖各字段的collection并放大到指定大小
+    python -m webapitest.benchmarks.postman_codec --size 100
+"""
+import json
+import time
+import argparse
+import dataclasses
+from ..postman import Collection, Items, RequestClass, ResponseClass
+from ..src.base import from_list, from_union, from_none, from_dict, from_str, from_float, from_int, from_bool, to_class
+from ..src.case import (Information, Auth, Event, Variable, Description, Header, URLClass, Body, Certificate,
+                        ProxyConfig, Cookie)
+from ..src.decoder import decode
+
+
+def gen_item(i):
+    request = {
+        'method': 'POST' if i % 2 else 'GET',
+        # 导出文件中description多为字符串，也可能是对象
+        'description': 'api %s' % i if i % 2 else {'content': 'api %s' % i, 'type': 'text/plain', 'version': None},
+        'header': [
+            {'key': 'Content-Type', 'value': 'application/json'},
+            {'key': 'X-Request-Id', 'value': str(i), 'disabled': False, 'description': 'trace id'},
+        ],
+        'url': {
+            'raw': 'http://{{host}}/api/v1/items/%s?page=1&size=20' % i,
+            'protocol': 'http',
+            'host': ['{{host}}'],
+            'path': ['api', 'v1', 'items', {'type': 'string', 'value': str(i)}],
+            'query': [{'key': 'page', 'value': '1'}, {'key': 'size', 'value': '20', 'disabled': True}],
+            'variable': [{'key': 'id', 'value': str(i), 'type': 'string', 'disabled': False}],
+        },
+        'auth': {'type': 'noauth', 'noauth': None},
+        'body': {'mode': 'raw', 'raw': json.dumps({'id': i, 'name': 'item%s' % i})},
+    }
+    return {
+        'name': 'item%s' % i,
+        'id': 'id-%s' % i,
+        'request': request,
+        'event': [{'listen': 'test', 'script': {'type': 'text/javascript', 'exec': ['pm.test("ok");']}}],
+        'protocolProfileBehavior': {'disableBodyPruning': True},
+        'response': [{
+            'name': 'ok',
+            'originalRequest': request,
+            'status': 'OK',
+            'code': 200,
+            'responseTime': 12,
+            'header': [{'key': 'Content-Type', 'value': 'application/json'}, 'X-Raw: 1'],
+            'cookie': [{'domain': 'localhost', 'path': '/', 'name': 'session', 'value': 'x', 'httpOnly': True}],
+            'body': json.dumps({'id': i, 'items': list(range(10))}),
+        }],
+    }
+
+
+def gen_collection(size_mb, folder_size=100):
+    """
+        生成约size_mb兆的collection，每个目录folder_size个接口
+    """
+    sample = len(json.dumps(gen_item(0)))
+    count = max(1, int(size_mb * 1024 * 1024 / sample))
+    folders = [{
+        'name': 'folder%s' % start,
+        'item': [gen_item(i) for i in range(start, min(start + folder_size, count))],
+    } for start in range(0, count, folder_size)]
+    return {
+        'info': {
+            'name': 'bench',
+            '_postman_id': 'bench',
+            'schema': 'https://schema.getpostman.com/json/collection/v2.1.0/collection.json',
+        },
+        'item': folders,
+        'variable': [{'key': 'host', 'value': 'localhost', 'type': 'string'}],
+    }
+
+
+def request_from_dict_by_union(obj) -> RequestClass:
+    """
+        原来RequestClass.from_dict的实现
+    """
+    assert isinstance(obj, dict)
+    description = from_union([Description.from_dict, from_none, from_str], obj.get("description"))
+    header = from_union([lambda x: from_list(Header.from_dict, x), from_str, from_none], obj.get("header"))
+    url = from_union([URLClass.from_dict, from_str, from_none], obj.get("url"))
+    auth = from_union([from_none, Auth.from_dict], obj.get("auth"))
+    body = from_union([Body.from_dict, from_none], obj.get("body"))
+    certificate = from_union([Certificate.from_dict, from_none], obj.get("certificate"))
+    method = from_union([from_str, from_none], obj.get("method"))
+    proxy = from_union([ProxyConfig.from_dict, from_none], obj.get("proxy"))
+    return RequestClass(description, header, url, auth, body, certificate, method, proxy)
+
+
+def response_from_dict_by_union(obj) -> ResponseClass:
+    """
+        原来ResponseClass.from_dict的实现
+    """
+    assert isinstance(obj, dict)
+    header = from_union(
+        [lambda x: from_list(lambda x: from_union([Header.from_dict, from_str], x), x), from_none, from_str],
+        obj.get("header"))
+    original_request = from_union([request_from_dict_by_union, from_str, from_none], obj.get("originalRequest"))
+    response_time = from_union([from_float, from_str, from_none], obj.get("responseTime"))
+    body = from_union([from_none, from_str], obj.get("body"))
+    code = from_union([from_int, from_none], obj.get("code"))
+    cookie = from_union([lambda x: from_list(Cookie.from_dict, x), from_none], obj.get("cookie"))
+    id = from_union([from_str, from_none], obj.get("id"))
+    status = from_union([from_str, from_none], obj.get("status"))
+    timings = from_union([lambda x: from_dict(lambda x: x, x), from_none], obj.get("timings"))
+    return ResponseClass(header, original_request, response_time, body, code, cookie, id, status, timings)
+
+
+def items_from_dict_by_union(obj) -> Items:
+    """
+        原来Items.from_dict的实现，流式导入时每个item原来由它解码
+    """
+    assert isinstance(obj, dict)
+    description = from_union([Description.from_dict, from_none, from_str], obj.get("description"))
+    request = from_union([request_from_dict_by_union, from_str, from_none], obj.get("request"))
+    event = from_union([lambda x: from_list(Event.from_dict, x), from_none], obj.get("event"))
+    id = from_union([from_str, from_none], obj.get("id"))
+    name = from_union([from_str, from_none], obj.get("name"))
+    protocol_profile_behavior = from_union([lambda x: from_dict(lambda x: x, x), from_none],
+                                           obj.get("protocolProfileBehavior"))
+    response = from_union([lambda x: from_list(lambda x: from_union(
+        [from_none, from_float, from_int, from_bool, from_str, lambda x: from_list(lambda x: x, x),
+         response_from_dict_by_union], x), x), from_none], obj.get("response"))
+    variable = from_union([lambda x: from_list(Variable.from_dict, x), from_none], obj.get("variable"))
+    auth = from_union([from_none, Auth.from_dict], obj.get("auth"))
+    item = from_union([lambda x: from_list(items_from_dict_by_union, x), from_none], obj.get("item"))
+    return Items(description, request, event, id, name, protocol_profile_behavior, response, variable, auth, item)
+
+
+def from_dict_by_union(obj) -> Collection:
+    """
+        原来Collection.from_dict的实现
+    """
+    assert isinstance(obj, dict)
+    info = Information.from_dict(obj.get("info"))
+    item = from_list(items_from_dict_by_union, obj.get("item"))
+    auth = from_union([from_none, Auth.from_dict], obj.get("auth"))
+    event = from_union([lambda x: from_list(Event.from_dict, x), from_none], obj.get("event"))
+    protocol_profile_behavior = from_union([lambda x: from_dict(lambda x: x, x), from_none],
+                                           obj.get("protocolProfileBehavior"))
+    variable = from_union([lambda x: from_list(Variable.from_dict, x), from_none], obj.get("variable"))
+    return Collection(info, item, auth, event, protocol_profile_behavior, variable)
+
+
+def to_dict_by_union(collection) -> dict:
+    """
+        原来Collection.to_dict的实现
+    """
+    result: dict = {}
+    result["info"] = to_class(Information, collection.info)
+    result["item"] = from_list(lambda x: to_class(Items, x), collection.item)
+    result["auth"] = from_union([from_none, lambda x: to_class(Auth, x)], collection.auth)
+    result["event"] = from_union([lambda x: from_list(lambda x: to_class(Event, x), x), from_none], collection.event)
+    result["protocolProfileBehavior"] = from_union([lambda x: from_dict(lambda x: x, x), from_none],
+                                                   collection.protocol_profile_behavior)
+    result["variable"] = from_union([lambda x: from_list(lambda x: to_class(Variable, x), x), from_none],
+                                    collection.variable)
+    return collection.pick_changed(result)
+
+
+def assert_same(a, b, path='$'):
+    """
+        逐层比较两棵对象树，每个值的类型也必须一致(==不区分1与1.0)
+    """
+    assert type(a) is type(b), '%s: %s != %s' % (path, type(a).__name__, type(b).__name__)
+    if dataclasses.is_dataclass(a):
+        for f in dataclasses.fields(a):
+            assert_same(getattr(a, f.name), getattr(b, f.name), '%s.%s' % (path, f.name))
+    elif isinstance(a, list):
+        assert len(a) == len(b), '%s: length %s != %s' % (path, len(a), len(b))
+        for i, (x, y) in enumerate(zip(a, b)):
+            assert_same(x, y, '%s[%s]' % (path, i))
+    elif isinstance(a, dict):
+        assert list(a) == list(b), '%s: keys %s != %s' % (path, list(a), list(b))
+        for key in a:
+            assert_same(a[key], b[key], '%s.%s' % (path, key))
+    else:
+        assert a == b, '%s: %r != %r' % (path, a, b)
+
+
+def iter_leaf_items(items):
+    """
+        流式导入时逐个解码的item：目录之外的每个接口
+    """
+    for item in items:
+        if 'request' not in item and isinstance(item.get('item'), list):
+            yield from iter_leaf_items(item['item'])
+        else:
+            yield item
+
+
+def run(size_mb=100) -> dict:
+    text = json.dumps(gen_collection(size_mb))
+    start = time.perf_counter()
+    obj = json.loads(text)
+    loads_time = time.perf_counter() - start
+
+    # 分别计时，避免另一棵对象树留在内存中拖慢垃圾回收
+    start = time.perf_counter()
+    from_dict_by_union(obj)
+    union_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    res = decode(Collection, obj)
+    decode_time = time.perf_counter() - start
+    assert_same(res, from_dict_by_union(obj))
+
+    leaves = list(iter_leaf_items(obj['item']))
+    start = time.perf_counter()
+    for item in leaves:
+        items_from_dict_by_union(item)
+    items_union_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for item in leaves:
+        Items.from_dict(item)
+    items_decode_time = time.perf_counter() - start
+    for item in leaves:
+        assert_same(Items.from_dict(item), items_from_dict_by_union(item))
+    del obj, leaves
+
+    start = time.perf_counter()
+    expected = to_dict_by_union(res)
+    to_dict_time = time.perf_counter() - start
+    del expected
+
+    start = time.perf_counter()
+    data = res.to_dict()
+    encode_time = time.perf_counter() - start
+    assert json.dumps(data) == json.dumps(to_dict_by_union(res)), 'encoded collection differs from to_dict'
+    return {
+        'size_mb': len(text) / 1024 / 1024,
+        'loads_seconds': loads_time,
+        'from_union_seconds': union_time,
+        'decoder_seconds': decode_time,
+        'items_from_union_seconds': items_union_time,
+        'items_decoder_seconds': items_decode_time,
+        'to_dict_seconds': to_dict_time,
+        'encoder_seconds': encode_time,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=float, default=100, help='collection大小(MB)')
+    args = parser.parse_args()
+    res = run(args.size)
+    print('size=%.1fMB' % res['size_mb'])
+    print('json.loads:  %.3fs' % res['loads_seconds'])
+    print('from_union:  %.3fs' % res['from_union_seconds'])
+    print('decoder:     %.3fs' % res['decoder_seconds'])
+    print('streamed items from_union: %.3fs' % res['items_from_union_seconds'])
+    print('streamed items decoder:    %.3fs' % res['items_decoder_seconds'])
+    print('to_dict:     %.3fs' % res['to_dict_seconds'])
+    print('encoder:     %.3fs' % res['encoder_seconds'])
+
+
+if __name__ == '__main__':
+    main()
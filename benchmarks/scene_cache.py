@@ -0,0 +1,70 @@
+"""
+    场景缓存基准：生成场景文件树，对比不使用缓存、首次建立缓存与命中缓存的载入耗时
+    python -m webapitest.benchmarks.scene_cache --files 20000
+"""
+import os
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from ..project import Project
+from ..src.scene import Scene
+
+
+def gen_case_tree(root, file_count, cases_per_file=5, files_per_dir=500):
+    for i in range(file_count):
+        dirpath = os.path.join(root, 'dir%s' % (i // files_per_dir))
+        os.makedirs(dirpath, exist_ok=True)
+        scene = {
+            'name': 'scene%s' % i,
+            'url': 'http://{{host}}/api/items/%s' % i,
+            'method': 'POST' if i % 2 else 'GET',
+            'cases': [{'name': 'case%s' % j, 'params': {'id': str(j), 'name': 'user%s' % j, 'host': '{{host}}'}}
+                      for j in range(cases_per_file)]
+        }
+        f = open(os.path.join(dirpath, 'scene%s.json' % i), 'w', encoding='utf-8')
+        f.write(json.dumps(scene, indent=4, ensure_ascii=False))
+        f.close()
+
+
+def load(path, cache_dir):
+    project = Project(path=path, env={'host': 'localhost'}, cache_dir=cache_dir, scene_cache=cache_dir is not None)
+    start = time.perf_counter()
+    count = 0
+    for scene_path, _ in project.iter_scene_files():
+        project.load_cached(scene_path, Scene.load_from_file)
+        count += 1
+    project.save_cache()
+    return time.perf_counter() - start, count
+
+
+def run(file_count=20000, root=None) -> dict:
+    tmp = tempfile.mkdtemp(prefix='webapitest_bench_')
+    try:
+        cases_path = root or os.path.join(tmp, 'cases')
+        if not root:
+            gen_case_tree(cases_path, file_count)
+        cache_dir = os.path.join(tmp, 'cache')
+        no_cache, count = load(cases_path, None)
+        cold, _ = load(cases_path, cache_dir)
+        warm, _ = load(cases_path, cache_dir)
+        return {'files': count, 'no_cache_seconds': no_cache, 'cold_seconds': cold, 'warm_seconds': warm}
+    finally:
+        shutil.rmtree(tmp)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--files', type=int, default=20000)
+    parser.add_argument('--path', default=None, help='使用已有用例目录，不生成')
+    args = parser.parse_args()
+    res = run(args.files, args.path)
+    print('files=%(files)s' % res)
+    print('no cache:    %.3fs' % res['no_cache_seconds'])
+    print('cold cache:  %.3fs' % res['cold_seconds'])
+    print('warm cache:  %.3fs' % res['warm_seconds'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+    命令行启动基准：在子进程中执行命令，统计墙钟耗时，并用python -X importtime列出累计耗时最多的模块
+    python -m webapitest.benchmarks.startup --repeat 20
+"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+import statistics
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+COMMANDS = [
+    ['-m', 'webapitest.main', '--help'],
+    ['-m', 'webapitest.main', 'checkcsv', '--help'],
+    ['-c', 'import webapitest.project'],
+    ['-c', 'import webapitest.postman'],
+]
+
+
+def _env():
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [PACKAGE_ROOT, env.get('PYTHONPATH')]))
+    return env
+
+
+def wall_times(args, repeat) -> list:
+    env = _env()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, env=env, stdout=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def import_times(args, top=10) -> list:
+    """
+    :return: 累计耗时最多的top个模块 [(模块名, 累计微秒)]
+    """
+    proc = subprocess.run([sys.executable, '-X', 'importtime'] + args, env=_env(),
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True, universal_newlines=True)
+    res = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        res.append((name.strip(), int(cumulative)))
+    res.sort(key=lambda x: -x[1])
+    return res[:top]
+
+
+def run(repeat=10, top=10) -> list:
+    res = []
+    for args in COMMANDS:
+        times = wall_times(args, repeat)
+        res.append({
+            'command': ' '.join(args),
+            'median': statistics.median(times),
+            'min': min(times),
+            'imports': import_times(args, top),
+        })
+    return res
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--target', type=float, default=100, help='--help的中位耗时目标(毫秒)，超出时返回1')
+    args = parser.parse_args()
+    res = run(args.repeat, args.top)
+    for item in res:
+        print('python %s: median %.1fms, min %.1fms' % (item['command'], item['median'] * 1000, item['min'] * 1000))
+        for name, cumulative in item['imports']:
+            print('    %8.1fms  %s' % (cumulative / 1000, name))
+    help_median = res[0]['median'] * 1000
+    print('--help %.1fms, target %.0fms: %s' % (help_median, args.target, 'ok' if help_median <= args.target else 'over'))
+    if help_median > args.target:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+"""
+    webapitest自身开销的基准套件
+    生成指定规模的用例目录与Postman collection，分别计时目录扫描、场景解析、环境变量渲染、请求吞吐、Postman导入与导出，
+    结果写入json文件，可与其它提交的结果对比
+    请求发往进程内启动的本地http服务(与sample/helloworld_web相同的/login与接口)，也可用--host指向已启动的sample网站
+    各阶段都不使用cache_dir，计时不受当前目录下已有缓存的影响，也不在当前目录留下缓存
+    python -m webapitest.benchmarks.suite --files 2000 --requests 2000 --output bench.json --compare old.json
+"""
+import os
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from .scene_cache import gen_case_tree
+from .postman_codec import gen_collection
+from ..project import Project
+from ..src.scene import Scene
+from ..main import parse_postman_collection_to_casefile, parse_casefile_to_postman_collection
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'   # keep-alive，与实际网站一致
+    disable_nagle_algorithm = True  # 响应头与响应体分两次写出，不关闭Nagle时每个请求多等一次延迟确认(约40ms)
+
+    def _reply(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        body = b'{"ok": true}'
+        self.send_response(200)
+        if self.path.startswith('/login'):
+            self.send_header('Set-Cookie', 'remember_token=bench; Max-Age=3600; Path=/')
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = _reply
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalServer:
+    """
+        在后台线程中运行的本地http服务，端口由系统分配
+    """
+
+    def __init__(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self.server.daemon_threads = True
+        self._thread = threading.Thread(target=self.server.serve_forever, name='webapitest-bench-server',
+                                        daemon=True)
+
+    @property
+    def host(self):
+        return '127.0.0.1:%s' % self.server.server_address[1]
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _phase(seconds, items) -> dict:
+    return {'seconds': seconds, 'items': items, 'per_second': items / seconds if seconds else None}
+
+
+def bench_discovery(path):
+    start = time.perf_counter()
+    paths = [p for p, _ in Project(path=path, cache_dir=None).iter_scene_files()]
+    return _phase(time.perf_counter() - start, len(paths)), paths
+
+
+def bench_parsing(paths):
+    start = time.perf_counter()
+    scenes = [Scene.load_from_file(path) for path in paths]
+    return _phase(time.perf_counter() - start, len(scenes)), scenes
+
+
+def bench_templating(scenes, host):
+    project = Project(env={'host': host}, cache_dir=None)
+    start = time.perf_counter()
+    count = 0
+    for scene in scenes:
+        scene.set_project(project)
+        for _ in scene.iter_request_args():
+            count += 1
+    return _phase(time.perf_counter() - start, count)
+
+
+def bench_requests(path, paths, host, engine, request_count, cases_per_file=5):
+    project = Project(path=path, env={'host': host}, engine=engine, cache_dir=None,
+                      report_path=None, results_path=None)
+    paths = paths[:max(1, request_count // cases_per_file)]
+    try:
+        start = time.perf_counter()
+        project.run_files(paths)
+        seconds = time.perf_counter() - start
+    finally:
+        project.close()
+    errors = sum(1 for r in project.results if 'error' in r)
+    assert not errors, '%s requests failed' % errors
+    return _phase(seconds, len(project.results))
+
+
+def bench_postman_import(tmp, size_mb):
+    collection_path = os.path.join(tmp, 'collection.json')
+    f = open(collection_path, 'w', encoding='utf-8')
+    f.write(json.dumps(gen_collection(size_mb)))
+    f.close()
+    start = time.perf_counter()
+    res = parse_postman_collection_to_casefile(collection_path, os.path.join(tmp, 'imported'), workers=4)
+    return _phase(time.perf_counter() - start, res['written'] + res['skipped'])
+
+
+def bench_postman_export(tmp, path, file_count):
+    start = time.perf_counter()
+    parse_casefile_to_postman_collection(path, os.path.join(tmp, 'exported.json'), cache_dir=None)
+    return _phase(time.perf_counter() - start, file_count)
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                              universal_newlines=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(file_count=2000, request_count=2000, size_mb=10, engine='sync', host=None) -> dict:
+    params = {'files': file_count, 'requests': request_count, 'postman_mb': size_mb, 'engine': engine, 'host': host}
+    phases = {}
+    tmp = tempfile.mkdtemp(prefix='webapitest_bench_')
+    try:
+        path = os.path.join(tmp, 'cases')
+        gen_case_tree(path, file_count)
+        server = LocalServer() if host is None else None
+        if server:
+            server.__enter__()
+            host = server.host
+        try:
+            phases['discovery'], paths = bench_discovery(path)
+            phases['parsing'], scenes = bench_parsing(paths)
+            phases['templating'] = bench_templating(scenes, host)
+            del scenes
+            phases['requests'] = bench_requests(path, paths, host, engine, request_count)
+        finally:
+            if server:
+                server.__exit__(None, None, None)
+        phases['postman_import'] = bench_postman_import(tmp, size_mb)
+        phases['postman_export'] = bench_postman_export(tmp, path, file_count)
+    finally:
+        shutil.rmtree(tmp)
+    return {
+        'commit': _commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': params,
+        'phases': phases,
+    }
+
+
+def compare(res, baseline) -> list:
+    """
+    :return: [(阶段, 本次秒数, 对比秒数, 本次/对比)]
+    """
+    rows = []
+    for name, phase in res['phases'].items():
+        old = baseline.get('phases', {}).get(name)
+        if old and old['seconds']:
+            rows.append((name, phase['seconds'], old['seconds'], phase['seconds'] / old['seconds']))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--files', type=int, default=2000, help='生成的场景文件数，每个文件5个用例')
+    parser.add_argument('--requests', type=int, default=2000, help='吞吐测试发送的请求数')
+    parser.add_argument('--postman-size', type=float, default=10, help='导入测试的collection大小(MB)')
+    parser.add_argument('--engine', default='sync', choices=['sync', 'asyncio'])
+    parser.add_argument('--host', default=None, help='使用已启动的网站，如127.0.0.1:5000，默认启动进程内服务')
+    parser.add_argument('--output', default='benchmark_results.json', help='结果写入的json文件')
+    parser.add_argument('--compare', default=None, help='与之对比的结果文件')
+    args = parser.parse_args()
+    res = run(args.files, args.requests, args.postman_size, args.engine, args.host)
+    for name, phase in res['phases'].items():
+        print('%-15s %8.3fs  %10.1f/s  (%s)' % (name, phase['seconds'], phase['per_second'] or 0, phase['items']))
+    f = open(args.output, 'w', encoding='utf-8')
+    f.write(json.dumps(res, indent=4, ensure_ascii=False))
+    f.close()
+    print('结果已写入%s' % args.output)
+    if args.compare:
+        f = open(args.compare, encoding='utf-8')
+        baseline = json.load(f)
+        f.close()
+        print('对比 %s (commit %s)' % (args.compare, baseline.get('commit')))
+        for name, seconds, old_seconds, ratio in compare(res, baseline):
+            print('%-15s %8.3fs -> %8.3fs  x%.2f' % (name, old_seconds, seconds, ratio))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+    环境变量渲染基准，对比逐个变量str.replace与预编译RenderPlan
+    python -m webapitest.benchmarks.template --envs 50 --cases 10000
+"""
+import time
+import argparse
+from ..src.base import Case
+from ..src.case import Header
+from ..src.scene import Scene, EnvironParam
+from ..src.template import RenderPlan
+
+
+def build_scene(env_count, case_count):
+    envs = [EnvironParam(key='var%s' % i, value='value%s' % i) for i in range(env_count)]
+    cases = [Case(name='case%s' % i, params={
+        'id': str(i),
+        'name': 'user%s' % i,
+        'host': '{{var%s}}' % (i % env_count),
+        'token': '{{var0}}-{{var%s}}' % (env_count - 1),
+    }) for i in range(case_count)]
+    scene = Scene(
+        name='bench',
+        url='http://{{var0}}/api/{{var1}}/items',
+        user=None,
+        method='GET',
+        cases=cases,
+        header=[Header(description=None, key='X-Token', value='{{var2}}')]
+    )
+    return scene, envs
+
+
+def render_by_replace(scene, envs) -> list:
+    """
+    :return: 与Scene.iter_request_args相同，每个用例的(url, headers, 参数)
+    """
+    url = scene.url
+    headers = {h.key: h.value for h in scene.header}
+    for e in envs:
+        url = url.replace('{{%s}}' % e.key, e.value)
+        headers = {k: v.replace('{{%s}}' % e.key, e.value) for k, v in headers.items()}
+    res = []
+    for case in scene.cases:
+        data = case.params
+        for e in envs:
+            data = {k: v.replace('{{%s}}' % e.key, e.value) for k, v in data.items()}
+        res.append((url, headers, data))
+    return res
+
+
+def render_by_plan(plan, scene) -> list:
+    url = plan.render(scene.url)
+    headers = plan.render_dict({h.key: h.value for h in scene.header})
+    return [(url, headers, plan.render_dict(case.params)) for case in scene.cases]
+
+
+def run(env_count=50, case_count=10000) -> dict:
+    scene, envs = build_scene(env_count, case_count)
+    start = time.perf_counter()
+    expected = render_by_replace(scene, envs)
+    replace_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    plan = RenderPlan(envs)
+    plan.compile_scene(scene)
+    compile_time = time.perf_counter() - start
+    start = time.perf_counter()
+    rendered = render_by_plan(plan, scene)
+    render_time = time.perf_counter() - start
+    assert rendered == expected, 'RenderPlan与str.replace的渲染结果不一致'
+    return {
+        'envs': env_count,
+        'cases': case_count,
+        'replace_seconds': replace_time,
+        'compile_seconds': compile_time,
+        'render_seconds': render_time,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--envs', type=int, default=50)
+    parser.add_argument('--cases', type=int, default=10000)
+    args = parser.parse_args()
+    res = run(args.envs, args.cases)
+    print('envs=%(envs)s cases=%(cases)s' % res)
+    print('str.replace:  %.4fs' % res['replace_seconds'])
+    print('RenderPlan:   %.4fs (compile %.4fs + render %.4fs)' % (
+        res['compile_seconds'] + res['render_seconds'], res['compile_seconds'], res['render_seconds']))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,22 +1,37 @@
+"""
+    命令行入口
+    postman、project等模块(及其依赖的requests)在子命令执行时才导入，--help等无需载入用例模型的命令启动更快
+"""
 import os
 import json
 import click
 from importlib import import_module
-from .postman import Collection
-from .project import Project
-from .src.case import Information
+from contextlib import contextmanager
+from .src.profiler import phase
 from .src.utils import logger
 
 
-def parse_postman_collection_to_casefile(path, casedir):
-    obj = Collection.load_from_file(path)
-    obj.gen_web_test_case_file(casedir)
+def parse_postman_collection_to_casefile(path, casedir, workers=4, prune=False):
+    with phase('import'):
+        from .postman import Collection
+    res = Collection.gen_web_test_case_file_from_stream(path, casedir, workers=workers, prune=prune)
+    logger.info('生成用例文件：写入%(written)s个，内容未变化%(skipped)s个，删除%(removed)s个' % res)
+    return res
 
 
-def parse_casefile_to_postman_collection(path, to_file_path):
+def parse_casefile_to_postman_collection(path, to_file_path, **project_params):
+    """
+    :param project_params: 传给Project的其它配置，如cache_dir=None不使用缓存目录
+    """
+    with phase('import'):
+        from .postman import Collection
+        from .project import Project
+        from .src.case import Information
     name = path.split('/')[-1][0]
-    project = Project(path=path)
-    project.load_scene()
+    # 导出的请求保留{{var}}原样，不需要环境变量
+    project_params.setdefault('check_envs', False)
+    project = Project(path=path, **project_params)
+    project.load_scene(go_through_all=Project.go_through_all)
     c = Collection(
         info=Information(
             description='auto parsed from webapitest. https://gitee.com/wow_1/webapitest',
@@ -25,19 +40,54 @@ def parse_casefile_to_postman_collection(path, to_file_path):
             schema='https://schema.getpostman.com/json/collection/v2.1.0/collection.json',
             version=None
         ),
-        item=project.get_scene_items(),
+        item=None,
         auth=None,
         event=None,
         protocol_profile_behavior=None,
         variable=None
     )
-    res = json.dumps(c.to_dict(), indent=4, ensure_ascii=False)
-    f = open(to_file_path, 'w')
-    f.write(res)
-    f.close()
+    with phase('export'):
+        c.item = project.get_scene_items()
+    with phase('encode'):
+        data = c.to_dict()
+    with phase('dump'):
+        res = json.dumps(data, indent=4, ensure_ascii=False)
+        f = open(to_file_path, 'w')
+        f.write(res)
+        f.close()
     return c
 
 
+def profile_options(f):
+    """
+        为子命令加上--profile等选项
+    """
+    f = click.option('--profile-output', default='local_profile',
+                     help='原始数据写入<profile-output>.json，cProfile数据写入<profile-output>.prof')(f)
+    f = click.option('--profile-tracemalloc', default=0, type=int, help='列出内存分配最多的N个位置，0为不统计')(f)
+    f = click.option('--profile-cprofile', is_flag=True, default=False, help='同时记录主线程的cProfile数据')(f)
+    f = click.option('--profile', is_flag=True, default=False,
+                     help='统计扫描、解析、渲染、等待网络、日志等各阶段的耗时')(f)
+    return f
+
+
+@contextmanager
+def profiling(profile, profile_cprofile, profile_tracemalloc, profile_output):
+    """
+        启用--profile时统计代码块内各阶段的耗时，结束后输出汇总
+    """
+    if not (profile or profile_cprofile or profile_tracemalloc):
+        yield
+        return
+    from .src.profiler import Profiler
+    profiler = Profiler(cprofile=profile_cprofile, tracemalloc_top=profile_tracemalloc, output=profile_output)
+    try:
+        with profiler:
+            yield
+    finally:
+        click.echo(profiler.summary())
+
+
 @click.group()
 def cli():
     pass
@@ -47,25 +97,31 @@ def cli():
 @click.argument('path')
 # @click.option('--path', prompt='Postman用例文件路径地址', help='eg. Postman右键导出，生成文件deal.collection.json')
 @click.option('--casedir', prompt='导出用例文件夹名', help='eg: cases 导出用例将放在当前位置的cases文件夹中')
-def parse(path, casedir):
+@click.option('--workers', default=4, type=int, help='写用例文件的线程数')
+@click.option('--prune', is_flag=True, default=False, help='删除上次parse生成、collection里已不存在的用例文件')
+@profile_options
+def parse(path, casedir, workers, prune, **profile):
     current_dir = os.getcwd()
     if not path.startswith('/'):
         path = os.path.join(current_dir, path)
     if not casedir.startswith('/'):
         casedir = os.path.join(current_dir, casedir)
-    parse_postman_collection_to_casefile(path, casedir)
+    with profiling(**profile):
+        parse_postman_collection_to_casefile(path, casedir, workers, prune)
 
 
 @click.command(help="将Postman的用例文件转化为webapitest标准用例文件")
 @click.argument('casedir')
 @click.option('--postmanfile', prompt='导出Postman用例文件名', help='eg: deal.json')
-def parse2postmanfile(casedir, postmanfile):
+@profile_options
+def parse2postmanfile(casedir, postmanfile, **profile):
     current_dir = os.getcwd()
     if not casedir.startswith('/'):
         casedir = os.path.join(current_dir, casedir)
     if not postmanfile.startswith('/'):
         postmanfile = os.path.join(current_dir, postmanfile)
-    parse_casefile_to_postman_collection(casedir, postmanfile)
+    with profiling(**profile):
+        parse_casefile_to_postman_collection(casedir, postmanfile)
 
 
 def get_project_cls():
@@ -74,9 +130,13 @@ def get_project_cls():
     return getattr(settings, c)
 
 
-def get_project():
+def get_project(path='default', **kwargs):
     project_cls = get_project_cls()
-    return project_cls.gen()
+    if path != 'default':
+        if not path.startswith('/'):
+            path = os.path.join(os.getcwd(), path)
+        kwargs['path'] = path
+    return project_cls.gen(**kwargs)
 
 
 @click.command()
@@ -94,25 +154,56 @@ def initdb():
     logger.info("initdb")
     get_project().init_db()
 
-def get_project(path):
-    project_cls = get_project_cls()
-    if path == 'default':
-        p = project_cls.gen()
-    else:
-        if not path.startswith('/'):
-            current_dir = os.getcwd()
-            casedir = os.path.join(current_dir, path)
-        p = get_project_cls().gen(path=casedir)
-    return p
-
 
 @click.command(help='执行用例')
 @click.argument('path', default='default')
-def runcase(path):
+@click.option('--workers', default=None, type=int, help='并发执行场景的线程数，默认1即按顺序逐个执行')
+@click.option('--engine', default=None, type=click.Choice(['sync', 'asyncio']),
+              help='请求引擎，默认使用项目配置(sync)；asyncio需安装aiohttp')
+@click.option('--concurrency', default=None, type=int, help='asyncio引擎同时在途的最大请求数')
+@click.option('--processes', default=None, type=int, help='将场景文件分片到多个进程执行')
+@click.option('--report', default=None, help='执行结果汇总写入的json文件')
+@profile_options
+def runcase(path, workers, engine, concurrency, processes, report, **profile):
     logger.info("runcase " + path)
-    p = get_project(path)
-    p.load_cookie()
-    p.run()
+    options = {'workers': workers, 'engine': engine, 'concurrency': concurrency, 'processes': processes,
+               'report_path': report}
+    with profiling(**profile):
+        with phase('import'):
+            p = get_project(path, **{k: v for k, v in options.items() if v is not None})
+        try:
+            with phase('login'):
+                p.load_cookie()
+            p.run()
+        finally:
+            p.close()
+
+
+@click.command(help='按目标请求速率回放用例，进行压力测试')
+@click.argument('casedir', default='default')
+@click.option('--rps', type=float, prompt='目标每秒请求数', help='目标每秒请求数')
+@click.option('--duration', type=float, default=10, help='持续秒数，默认10')
+@click.option('--engine', default=None, type=click.Choice(['sync', 'asyncio']),
+              help='请求引擎，默认使用项目配置(sync)；高速率建议asyncio')
+@click.option('--concurrency', default=None, type=int, help='同时在途的最大请求数，sync引擎即线程数')
+@click.option('--report', default='local_load_report.json', help='压测结果写入的json文件')
+def load(casedir, rps, duration, engine, concurrency, report):
+    from .src.load import LoadGenerator
+    logger.info("load " + casedir)
+    options = {'engine': engine, 'concurrency': concurrency}
+    p = get_project(casedir, **{k: v for k, v in options.items() if v is not None})
+    # 每个线程都需要独占一个Session
+    p.session_pool_size = max(p.session_pool_size, p.concurrency)
+    # 压测记录每次请求的实际结果，不重试
+    p.retries = 0
+    try:
+        p.load_cookie()
+        res = LoadGenerator(p, rps, duration).run()
+    finally:
+        p.close()
+    f = open(report, 'w', encoding='utf-8')
+    f.write(json.dumps(res, indent=4, ensure_ascii=False))
+    f.close()
 
 
 @click.command()
@@ -146,6 +237,7 @@ functions = [
     parse2postmanfile,
     cleandb,
     runcase,
+    load,
     initdb,
     createcsv,
     checkcsv,
@@ -4,6 +4,12 @@
 import os
 
 from .src.case import *
+from .src.decoder import decode
+from .src.encoder import encode
+from .src.jsonstream import JsonStream
+from .src.profiler import phase
+from .src.utils import logger
+from .src.writer import CaseFileWriter
 
 
 @dataclass
@@ -19,16 +25,7 @@ class RequestClass(DataClassMixin):
 
     @staticmethod
     def from_dict(obj: Any) -> 'RequestClass':
-        assert isinstance(obj, dict)
-        description = from_union([Description.from_dict, from_none, from_str], obj.get("description"))
-        header = from_union([lambda x: from_list(Header.from_dict, x), from_str, from_none], obj.get("header"))
-        url = from_union([URLClass.from_dict, from_str, from_none], obj.get("url"))
-        auth = from_union([from_none, Auth.from_dict], obj.get("auth"))
-        body = from_union([Body.from_dict, from_none], obj.get("body"))
-        certificate = from_union([Certificate.from_dict, from_none], obj.get("certificate"))
-        method = from_union([from_str, from_none], obj.get("method"))
-        proxy = from_union([ProxyConfig.from_dict, from_none], obj.get("proxy"))
-        return RequestClass(description, header, url, auth, body, certificate, method, proxy)
+        return decode(RequestClass, obj)
 
     def to_dict(self) -> dict:
         result: dict = {}
@@ -41,7 +38,7 @@ class RequestClass(DataClassMixin):
         result["certificate"] = from_union([lambda x: to_class(Certificate, x), from_none], self.certificate)
         result["method"] = from_union([from_str, from_none], self.method)
         result["proxy"] = from_union([lambda x: to_class(ProxyConfig, x), from_none], self.proxy)
-        return {k:result[k] for k in result if k in self.get_changed_keys()}
+        return self.pick_changed(result)
 
     def get_params(self):
         if self.url:
@@ -79,19 +76,7 @@ class ResponseClass(DataClassMixin):
 
     @staticmethod
     def from_dict(obj: Any) -> 'ResponseClass':
-        assert isinstance(obj, dict)
-        header = from_union(
-            [lambda x: from_list(lambda x: from_union([Header.from_dict, from_str], x), x), from_none, from_str],
-            obj.get("header"))
-        original_request = from_union([RequestClass.from_dict, from_str, from_none], obj.get("originalRequest"))
-        response_time = from_union([from_float, from_str, from_none], obj.get("responseTime"))
-        body = from_union([from_none, from_str], obj.get("body"))
-        code = from_union([from_int, from_none], obj.get("code"))
-        cookie = from_union([lambda x: from_list(Cookie.from_dict, x), from_none], obj.get("cookie"))
-        id = from_union([from_str, from_none], obj.get("id"))
-        status = from_union([from_str, from_none], obj.get("status"))
-        timings = from_union([lambda x: from_dict(lambda x: x, x), from_none], obj.get("timings"))
-        return ResponseClass(header, original_request, response_time, body, code, cookie, id, status, timings)
+        return decode(ResponseClass, obj)
 
     def to_dict(self) -> dict:
         result: dict = {}
@@ -107,7 +92,7 @@ class ResponseClass(DataClassMixin):
         result["id"] = from_union([from_str, from_none], self.id)
         result["status"] = from_union([from_str, from_none], self.status)
         result["timings"] = from_union([lambda x: from_dict(lambda x: x, x), from_none], self.timings)
-        return {k:result[k] for k in result if k in self.get_changed_keys()}
+        return self.pick_changed(result)
 
 
 @dataclass
@@ -141,21 +126,7 @@ class Items(DataClassMixin):
 
     @staticmethod
     def from_dict(obj: Any) -> 'Items':
-        assert isinstance(obj, dict)
-        description = from_union([Description.from_dict, from_none, from_str], obj.get("description"))
-        request = from_union([RequestClass.from_dict, from_str, from_none], obj.get("request"))
-        event = from_union([lambda x: from_list(Event.from_dict, x), from_none], obj.get("event"))
-        id = from_union([from_str, from_none], obj.get("id"))
-        name = from_union([from_str, from_none], obj.get("name"))
-        protocol_profile_behavior = from_union([lambda x: from_dict(lambda x: x, x), from_none],
-                                               obj.get("protocolProfileBehavior"))
-        response = from_union([lambda x: from_list(lambda x: from_union(
-            [from_none, from_float, from_int, from_bool, from_str, lambda x: from_list(lambda x: x, x),
-             ResponseClass.from_dict], x), x), from_none], obj.get("response"))
-        variable = from_union([lambda x: from_list(Variable.from_dict, x), from_none], obj.get("variable"))
-        auth = from_union([from_none, Auth.from_dict], obj.get("auth"))
-        item = from_union([lambda x: from_list(Items.from_dict, x), from_none], obj.get("item"))
-        return Items(description, request, event, id, name, protocol_profile_behavior, response, variable, auth, item)
+        return decode(Items, obj)
 
     def to_dict(self) -> dict:
         result: dict = {}
@@ -173,23 +144,50 @@ class Items(DataClassMixin):
                                         self.variable)
         result["auth"] = from_union([from_none, lambda x: to_class(Auth, x)], self.auth)
         result["item"] = from_union([lambda x: from_list(lambda x: to_class(Items, x), x), from_none], self.item)
-        return {k:result[k] for k in result if k in self.get_changed_keys()}
+        return self.pick_changed(result)
 
-    def gen_file(self, current_dir_path):
+    def gen_file(self, current_dir_path, writer=None):
+        """
+        :param writer: CaseFileWriter，内容未变化的文件不重写；默认在当前线程直接写入
+        """
+        writer = writer or CaseFileWriter(workers=1)
         if not os.path.exists(current_dir_path):
             os.mkdir(current_dir_path)
         if not self.request:
             for i in self.item:
                 current_path = os.path.join(current_dir_path, self.name)
-                i.gen_file(current_path)
+                i.gen_file(current_path, writer)
         else:
             current_path = os.path.join(current_dir_path, '%s.json' % self.name)
-            scene = self.gen_base_scene()
-            if scene:
-                f = open(current_path, 'w', encoding='utf-8')
-                dic = scene.to_dict()
-                f.write(json.dumps(dic, indent=4, ensure_ascii=False))
-                f.close()
+            with phase('generate'):
+                scene = self.gen_base_scene()
+                content = json.dumps(scene.to_dict(), indent=4, ensure_ascii=False) if scene else None
+            if content is not None:
+                writer.write(current_path, content)
+
+    @staticmethod
+    def gen_file_from_stream(stream, current_dir_path, writer=None):
+        """
+            从JsonStream中读取一个item并生成用例文件，效果同gen_file
+            目录在name之后出现item时逐个读取子item，不把整个目录读入内存
+        """
+        obj = {}
+        streamed = False
+        for key in stream.iter_object():
+            if key == 'item' and 'request' not in obj and isinstance(obj.get('name'), str) and stream.peek() == '[':
+                if not os.path.exists(current_dir_path):
+                    os.mkdir(current_dir_path)
+                current_path = os.path.join(current_dir_path, obj['name'])
+                for _ in stream.iter_array():
+                    Items.gen_file_from_stream(stream, current_path, writer)
+                streamed = True
+            else:
+                with phase('parse'):
+                    obj[key] = stream.value()
+        if not streamed:
+            with phase('decode'):
+                items = decode(Items, obj)
+            items.gen_file(current_dir_path, writer)
 
     def gen_base_scene(self):
         """
@@ -257,34 +255,56 @@ class Collection(DataClassMixin, FileLoaderMixin):
 
     @staticmethod
     def from_dict(obj: Any) -> 'Collection':
-        assert isinstance(obj, dict)
-        info = Information.from_dict(obj.get("info"))
-        item = from_list(Items.from_dict, obj.get("item"))
-        auth = from_union([from_none, Auth.from_dict], obj.get("auth"))
-        event = from_union([lambda x: from_list(Event.from_dict, x), from_none], obj.get("event"))
-        protocol_profile_behavior = from_union([lambda x: from_dict(lambda x: x, x), from_none],
-                                               obj.get("protocolProfileBehavior"))
-        variable = from_union([lambda x: from_list(Variable.from_dict, x), from_none], obj.get("variable"))
-        return Collection(info, item, auth, event, protocol_profile_behavior, variable)
+        """
+            导出的collection可能很大，使用按注解生成的解码表，结果与各类的from_dict一致
+        """
+        return decode(Collection, obj)
 
     def to_dict(self) -> dict:
-        result: dict = {}
-        result["info"] = to_class(Information, self.info)
-        result["item"] = from_list(lambda x: to_class(Items, x), self.item)
-        result["auth"] = from_union([from_none, lambda x: to_class(Auth, x)], self.auth)
-        result["event"] = from_union([lambda x: from_list(lambda x: to_class(Event, x), x), from_none], self.event)
-        result["protocolProfileBehavior"] = from_union([lambda x: from_dict(lambda x: x, x), from_none],
-                                                       self.protocol_profile_behavior)
-        result["variable"] = from_union([lambda x: from_list(lambda x: to_class(Variable, x), x), from_none],
-                                        self.variable)
-        return {k:result[k] for k in result if k in self.get_changed_keys()}
+        """
+            使用按注解生成的编码表，输出与各类的to_dict一致
+        """
+        return encode(self)
+
+    @staticmethod
+    def gen_web_test_case_file_from_stream(path, root_cases_path, workers=4, prune=False):
+        """
+            边解析边生成webapitest的标准测试用例文件，不构建完整的Collection，
+            内存占用取决于最大的单个接口
+        :return: 同gen_web_test_case_file
+        """
+        logger.info('load collection from file %s' % path)
+        if not os.path.exists(root_cases_path):
+            os.mkdir(root_cases_path)
+        keys = set()
+        f = open(path, encoding='utf-8')
+        try:
+            with CaseFileWriter(root_cases_path, workers=workers, prune=prune) as writer:
+                stream = JsonStream(f)
+                for key in stream.iter_object():
+                    keys.add(key)
+                    if key == 'item':
+                        for _ in stream.iter_array():
+                            Items.gen_file_from_stream(stream, root_cases_path, writer)
+                    elif key == 'info':
+                        decode(Information, stream.value())
+                    else:
+                        stream.value()
+                assert 'info' in keys and 'item' in keys, 'invalid collection file %s' % path
+        finally:
+            f.close()
+        return writer.to_dict()
 
-    def gen_web_test_case_file(self, root_cases_path):
+    def gen_web_test_case_file(self, root_cases_path, workers=4, prune=False):
         """
             生产webapitest的标准测试用例文件
-        :return:
+        :param workers: 写文件的线程数
+        :param prune: 删除上次生成、本次没有生成的用例文件
+        :return: {'written': 写入数, 'skipped': 内容未变化跳过数, 'removed': 删除数}
         """
         if not os.path.exists(root_cases_path):
             os.mkdir(root_cases_path)
-        for i in self.item:
-            i.gen_file(root_cases_path)
+        with CaseFileWriter(root_cases_path, workers=workers, prune=prune) as writer:
+            for i in self.item:
+                i.gen_file(root_cases_path, writer)
+        return writer.to_dict()
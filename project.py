@@ -1,8 +1,22 @@
 import os
-import re
+import json
+import hashlib
+import functools
+import time
+import threading
+from urllib.parse import urljoin, urlsplit
 from builtins import NotImplementedError
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from multiprocessing.util import Finalize
+from .src.cache import SceneCache
 from .src.scene import Scene, EnvironParam
-from .src.utils import write_csv, logger
+from .src.report import SummaryAggregator, JsonlResultWriter
+from .src.sync import SyncManifest
+from .src.cookiejar import CookieJar, login_digest, response_cookie
+from .src.hooks import Hooks
+from .src.writer import CaseFileWriter, file_digest
+from .src.profiler import phase, iter_phase
+from .src.utils import dump_csv, logger, grouped_logs
 
 
 class Project:
@@ -17,8 +31,50 @@ class Project:
     scenes = []
     scene_structure = {}
     login_url = ''
+    workers: int = 1    # 并发执行场景的线程数，1为按扫描顺序逐个执行
+    processes: int = 1  # 将场景文件分片到多个进程执行，每个进程内仍按workers并发
+    report_path: str = 'local_report.json'     # 执行结果汇总写入的json文件，设为None不写入
+    results_path: str = 'local_results.jsonl'   # 每完成一个用例即写入一行的结果文件，设为None不写入
+    body_capture: int = 4096    # 只保留响应体的前N个字节用于日志与结果文件，设为None保留全部
+    cache_dir: str = '.webapitest_cache'    # 场景缓存、登录cookie与csv同步记录所在目录，设为None不使用
+    scene_cache: bool = False   # 缓存已解析的场景；场景解析已很快，缓存读写反而更慢，默认关闭
+    engine: str = 'sync'    # 请求引擎：sync 或 asyncio
+    concurrency: int = 100  # asyncio引擎同时在途的最大请求数
+    session_pool_size: int = 4  # 每个(host, user)最多保持的Session数
+    max_connections_per_host: int = 10  # 每个Session对同一host最多保持的keep-alive连接数
+    share_case_keys: bool = False   # 参数键相同的用例共用键元组，用例数量很大时减少内存
+    check_envs: bool = True     # 载入场景时提示未定义的环境变量；导出Postman时保留{{var}}原样，不检查
+    login_workers: int = 8  # 并发登录的线程数
+    reuse_cookies: bool = True  # 登录cookie连同过期时间保存在cache_dir中，未过期时后续执行直接复用
+    cookie_expiry_margin: int = 30  # 距过期不足N秒的cookie视为已过期，重新登录
+    cookie_max_age: int = 3600  # 没有过期时间的会话cookie最多复用N秒，None为不限
+    connect_timeout: float = 5  # 建立连接的超时秒数，None为不限
+    read_timeout: float = 30    # 等待服务端数据的超时秒数(两次收到数据之间)，None为不限
+    retries: int = 2    # 幂等方法(GET/HEAD/OPTIONS/PUT/DELETE/TRACE)连接失败、超时或返回retry_statuses时的重试次数
+    retry_backoff: float = 0.2  # 第n次重试前随机等待0 ~ retry_backoff * 2^n秒
+    retry_backoff_max: float = 5    # 单次重试等待的上限秒数
+    retry_statuses = (502, 503, 504)
+    breaker_threshold: int = 5  # 同一host连续连接失败或超时N次后熔断，其余请求直接失败；0为不熔断
+    breaker_reset: float = 30   # 熔断持续秒数，之后放行一个请求试探
+    _executor = None
+    _engine = None
+    _scene_cache = None
+    _result_writer = None
+    _engine_lock = threading.Lock()
+    _login_lock = threading.Lock()
 
     def __init__(self, **kwargs):
+        self._params = dict(kwargs)
+        self.cookie_users = {}
+        self.scenes = []
+        self.results = []
+        self._summary = SummaryAggregator()
+        self._streamed = False  # 用例结果已写入results_path，不在results中保留
+        self._case_keys = {}
+        self._cookie_jar = None
+        self._relogged = set()
+        self._login_paths = None
+        self.hooks = Hooks()    # 事件订阅，见src/hooks.py；多进程执行时在gen中订阅，子进程同样生效
         for key, value in kwargs.items():
             setattr(self, key, value)
 
@@ -28,27 +84,174 @@ class Project:
             key=k, value=v
         ) for k, v in self.env.items()]
 
-    def load_cookie(self):
+    def get_engine(self):
+        with self._engine_lock:
+            if self._engine is None:
+                # 引擎依赖requests/aiohttp，只在需要发送请求时导入，csv转换等命令不必载入
+                from .src.engine import SyncEngine, AsyncioEngine
+                from .src.session import SessionPool
+                from .src.resilience import RetryPolicy, CircuitBreaker
+                # 同一(host, user)的场景可能由所有workers线程同时执行，每个线程都需要独占一个Session
+                self.session_pool = SessionPool(pool_size=max(self.session_pool_size, self.workers or 1),
+                                                max_connections=self.max_connections_per_host)
+                options = {
+                    'body_capture': self.body_capture,
+                    'timeout': None if self.connect_timeout is None and self.read_timeout is None
+                    else (self.connect_timeout, self.read_timeout),
+                    'retry': RetryPolicy(self.retries, self.retry_backoff, self.retry_backoff_max,
+                                         self.retry_statuses),
+                    'breaker': CircuitBreaker(self.breaker_threshold, self.breaker_reset),
+                }
+                if self.engine == 'asyncio':
+                    self._engine = AsyncioEngine(concurrency=self.concurrency,
+                                                 max_connections=self.max_connections_per_host,
+                                                 stats=self.session_pool.stats, **options)
+                elif self.engine == 'sync':
+                    self._engine = SyncEngine(self.session_pool, **options)
+                else:
+                    raise Exception('error engine: %s' % self.engine)
+            return self._engine
+
+    def close(self, log_stats=True):
         """
-            使用flask-login的cookie设置与解析，如网站使用其它方式设置cookie，可重写此方法。
+            释放请求引擎等资源
+        :param log_stats: 是否输出连接统计，子进程的统计已交给父进程汇总，不必输出
         :return:
         """
+        if self._engine is not None:
+            self._engine.close()
+            self._engine = None
+            if log_stats:
+                stats = self.session_pool.stats
+                logger.info('连接统计：新建%s个，复用%s次' % (stats.opened, stats.reused))
+
+    def get_cookie_jar(self):
+        """
+            配置了cache_dir且reuse_cookies为True时使用本地cookie缓存
+        """
+        if self._cookie_jar is None and self.cache_dir and self.reuse_cookies:
+            self._cookie_jar = CookieJar(self.cache_dir, margin=self.cookie_expiry_margin, max_age=self.cookie_max_age)
+        return self._cookie_jar
+
+    def load_login_scene(self):
         cookie_file_path = self.cookie_file_path
         if not self.cookie_file_path.startswith('/'):
             current_dir = os.getcwd()
             cookie_file_path = os.path.join(current_dir, self.cookie_file_path)
-
         scene = Scene.load_from_file(cookie_file_path)
         scene.set_project(self)
-        response_dict = scene.get_response()
-        pattern = re.compile('^' + self.cookie_key + '=(.*?);.*$')
-        for user, resp in response_dict.items():
-            try:
-                set_cookie_line = resp.headers._store['set-cookie'][1]
-                self.cookie_users[user] = pattern.match(set_cookie_line).groups()[0]  # 没记录过期时间
+        return scene
+
+    def load_cookie(self):
+        """
+            使用flask-login的cookie设置与解析，如网站使用其它方式设置cookie，可重写此方法或parse_login_cookie。
+            cookie缓存中仍然有效的直接复用，其余用户并发登录
+        :return:
+        """
+        jar = self.get_cookie_jar()
+        pending = []
+        for user, method, url, kwargs in self.load_login_scene().iter_request_args():
+            login = login_digest(method, url, kwargs)
+            cookie = jar.get(user, login) if jar else None
+            if cookie:
+                self.cookie_users[user] = cookie
+                logger.info('复用用户 %s 未过期的cookie，后续场景中可切换此用户。' % user)
+            else:
+                pending.append((user, method, url, kwargs, login))
+        self.login_users(pending)
+
+    def parse_login_cookie(self, response):
+        """
+            从登录响应中取出cookie，重写此方法以适配其它登录方式
+        :return: ('name=value', 过期时间戳)，会话cookie的过期时间为None
+        """
+        return response_cookie(response, self.cookie_key)
+
+    def login_users(self, pending):
+        """
+            用login_workers个线程并发登录，每个用户使用自己的Session，登录时建立的连接留给该用户的场景复用
+        :param pending: [(用户, method, url, kwargs, 登录请求摘要)]
+        :return:
+        """
+        if not pending:
+            return
+        engine = self.get_engine()
+        jar = self.get_cookie_jar()
+
+        def login(args):
+            user, method, url, kwargs, _ = args
+            return engine.request_all([(method, url, kwargs)], user=user)[0]
+
+        with ThreadPoolExecutor(max_workers=min(self.login_workers, len(pending)),
+                                thread_name_prefix='webapitest-login') as executor:
+            futures = [executor.submit(login, args) for args in pending]
+            for (user, _, _, _, digest), future in zip(pending, futures):
+                try:
+                    cookie, expires = self.parse_login_cookie(future.result())
+                    assert cookie, 'no cookie %s' % self.cookie_key
+                except Exception as e:
+                    logger.warning('登陆用户 %s 失败：%s，后续场景使用此用户等同于未登录。' % (user, str(e) or type(e).__name__),
+                                   exc_info=True)
+                    continue
+                self.cookie_users[user] = cookie
+                if jar:
+                    jar.set(user, cookie, expires, digest)
                 logger.info('成功登陆用户 %s，后续场景中可切换此用户。' % user)
-            except Exception as e:
-                logger.info('登陆用户 %s 失败，后续场景使用此用户等同于未登录。' % user)
+        if jar:
+            jar.save()
+
+    def is_cookie_rejected(self, response) -> bool:
+        """
+            重写此方法以识别登录态失效的响应，默认为401或重定向到登录页(flask-login的login_view即如此)
+        """
+        return response.status_code == 401 or self.is_login_redirect(response)
+
+    def get_login_paths(self) -> frozenset:
+        """
+            登录页的url路径：配置了login_url时为其路径，否则为登录场景的url路径
+        """
+        if self._login_paths is None:
+            urls = [self.login_url] if self.login_url else []
+            if not urls and getattr(self, 'cookie_file_path', None):
+                scene = self.load_login_scene()
+                urls.append(scene.plan.render(scene.url))
+            self._login_paths = frozenset(_url_path(url) for url in urls)
+        return self._login_paths
+
+    def is_login_redirect(self, response) -> bool:
+        """
+            响应本身或跟随过的重定向中，有指向登录页的3xx
+        """
+        login_paths = self.get_login_paths()
+        if not login_paths:
+            return False
+        for resp in list(response.history) + [response]:
+            location = resp.headers.get('Location') if 300 <= resp.status_code < 400 else None
+            if location and _url_path(urljoin(resp.url or '', location)) in login_paths:
+                return True
+        return False
+
+    def relogin(self, user, cookie):
+        """
+            场景中cookie被拒绝时调用：丢弃该cookie并重新登录此用户
+            多个场景同时发现时只登录一次，每个用户每次执行最多重新登录一次
+        :return: 用户当前的cookie，登录失败返回None
+        """
+        with self._login_lock:
+            if self.cookie_users.get(user) != cookie or user in self._relogged:
+                return self.cookie_users.get(user)
+            self._relogged.add(user)
+            logger.info('用户 %s 的cookie被拒绝，重新登录。' % user)
+            self.cookie_users.pop(user, None)
+            jar = self.get_cookie_jar()
+            if jar:
+                jar.discard(user)
+            self.login_users([(name, method, url, kwargs, login_digest(method, url, kwargs))
+                              for name, method, url, kwargs in self.load_login_scene().iter_request_args()
+                              if name == user])
+            if jar:
+                jar.save()
+            return self.cookie_users.get(user)
 
     def callback_only_read(self, path, structure):
         """
@@ -72,52 +275,243 @@ class Project:
         :param kwargs: 额外参数
         :return:
         """
-        scene.run()
+        scene.run(on_result=lambda result, resp: project.record_result(dict(result, path=path), resp))
+        # 每次执行都重新载入场景文件，执行过的场景不会再用到已构建的请求，场景很多时内存不随用例数增长
+        scene.clear_prepared()
 
-    def go_through_all(self, path, structure, target='json', callback=None, kwargs={}):
-        print(self, path, structure, callback)
-        if target == 'json':
-            scene = Scene.load_from_file(path)
-        elif target == 'csv':
-            scene = Scene.load_from_csv(path)
+    def record_result(self, result, response=None):
+        """
+            记录一个用例的结果，附上截断的响应体与完整响应体的哈希
+            配置了results_path时立即写入一行，不在results中保留，汇总统计逐个累计
+        :return:
+        """
+        if response is not None:
+            result = dict(result, body=response.content.decode('utf-8', 'replace'),
+                          body_sha256=getattr(response, 'body_sha256', None))
+        with phase('record'):
+            self._record_result(result)
+
+    def _record_result(self, result):
+        self._summary.add(result)
+        if self._result_writer is None:
+            self.results.append(result)
         else:
-            raise Exception('error target')
-        scene.set_project(self)
+            self._result_writer.write(result)
+
+    def load_cached(self, path, loader, depends=()):
+        """
+            开启scene_cache且配置了cache_dir时，文件未变化则直接使用缓存的场景对象
+        """
+        if not self.cache_dir or not self.scene_cache:
+            return loader(path)
+        if self._scene_cache is None:
+            self._scene_cache = SceneCache(self.cache_dir)
+        return self._scene_cache.load(path, loader, depends)
+
+    def save_cache(self):
+        if self._scene_cache is not None:
+            self._scene_cache.save()
+
+    def go_through_all(self, path, structure, target='json', callback=None, kwargs={}):
+        loaded = self.hooks.scene_loaded
+        start = time.perf_counter() if loaded is not None else None
+        with phase('load'):
+            if target == 'json':
+                scene = self.load_cached(path, Scene.load_from_file)
+            elif target == 'csv':
+                dirpath, filename = os.path.split(path)
+                json_path = os.path.join(dirpath, filename.replace('.csv', '.json'))
+                scene = self.load_cached(path, Scene.load_from_csv, depends=(json_path,))
+            else:
+                raise Exception('error target')
+            if self.share_case_keys:
+                scene.share_case_keys(self._case_keys)
+        with phase('render'):
+            scene.set_project(self)
+        if loaded is not None:
+            loaded(scene=scene, path=path, seconds=time.perf_counter() - start, bytes=os.path.getsize(path))
         self.scenes.append(scene)
         if scene.name not in structure:
             structure[scene.name] = scene
         if callback:
-            print('now', self, scene, structure, path, kwargs)
+            if self._executor:
+                self._futures.append(self._executor.submit(
+                    self._grouped_callback, callback, scene, structure, path, kwargs))
+            else:
+                callback(self, scene, structure, path, **kwargs)
+
+    def _grouped_callback(self, callback, scene, structure, path, kwargs):
+        with grouped_logs():
             callback(self, scene, structure, path, **kwargs)
 
     def load_scene(self, go_through_all, target='json', callback_method=None, kwargs={}):
         """
             识别路径下所有json文件，载入场景，执行回调
             也支持识别csv文件
+            边扫描边执行，不必等整个目录扫描完成
         :return:
         """
         self.scene_structure = {}
+        for path, current_data in iter_phase('scan', self.iter_scene_files(target, self.scene_structure)):
+            logger.info('load file ' + path)
+            go_through_all(self, path, current_data, target, callback_method, kwargs=kwargs)
+        self.save_cache()
 
-        def search(root, target, go_through_all=go_through_all, current_data={}):
-            items = os.listdir(root)
-            for item in items:
-                path = os.path.join(root, item)
-                if item.startswith('.'):
-                    # 忽略隐藏文件
-                    continue
-                elif os.path.isdir(path):
-                    if item not in current_data:
-                        current_data[item] = {}
-                    logger.info('scan dir ' + path)
-                    search(path, target, go_through_all=go_through_all, current_data=current_data[item])
-                elif path.split('/')[-1].split('.')[-1] == target:
-                    logger.info('load file ' + path)
-                    go_through_all(self, path, current_data, target, callback_method, kwargs=kwargs)
+    def iter_scene_files(self, target='json', structure=None):
+        """
+            用os.scandir扫描路径，每发现一个场景文件即产出(文件路径, 所在目录的结构字典)
+        :param structure: 目录结构写入此字典，供导出Postman使用
+        :return:
+        """
+        if structure is None:
+            structure = {}
+
+        def search(root, current_data):
+            with os.scandir(root) as entries:
+                for entry in entries:
+                    if entry.name.startswith('.'):
+                        # 忽略隐藏文件
+                        continue
+                    elif entry.is_dir():
+                        logger.info('scan dir ' + entry.path)
+                        yield from search(entry.path, current_data.setdefault(entry.name, {}))
+                    elif entry.name.split('.')[-1] == target:
+                        if target == 'csv' and not os.path.exists(entry.path[:-len('csv')] + 'json'):
+                            # 没有同名json的csv是数据驱动场景的用例数据(如data/users.csv)，不是场景文件
+                            continue
+                        yield entry.path, current_data
 
-        search(self.path, target, go_through_all=go_through_all, current_data=self.scene_structure)
+        return search(self.path, structure)
+
+    def _execute(self, load):
+        """
+            workers大于1时，用线程池并发执行load过程中提交的场景，每个场景的日志集中输出
+        """
+        if self.workers <= 1:
+            load()
+            return
+        self._futures = []
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='webapitest') as executor:
+            self._executor = executor
+            try:
+                load()
+            finally:
+                self._executor = None
+        for future in self._futures:
+            future.result()
 
     def run(self):
-        self.load_scene(go_through_all=Project.go_through_all, callback_method=Project.callback)
+        """
+            processes大于1时，将场景文件分片到多个进程执行，汇总各进程的用例结果
+        :return:
+        """
+        start = time.perf_counter()
+        # 同一项目可以多次执行，每次的结果与汇总只包含本次执行的用例
+        self.results = []
+        self._summary = SummaryAggregator()
+        self._streamed = False
+        # 每个用户每次执行最多重新登录一次
+        self._relogged = set()
+        if self.results_path:
+            self._result_writer = JsonlResultWriter(self.results_path)
+            self._streamed = True
+        try:
+            if self.processes > 1:
+                self._run_in_processes()
+            else:
+                self._execute(lambda: self.load_scene(go_through_all=Project.go_through_all,
+                                                      callback_method=Project.callback))
+        finally:
+            if self._result_writer is not None:
+                self._result_writer.close()
+                self._result_writer = None
+        summary = self.report()
+        if self.hooks.run_end is not None:
+            self.hooks.run_end(project=self, seconds=time.perf_counter() - start, summary=summary)
+
+    def run_files(self, paths):
+        """
+            执行指定的场景文件
+        :param paths: 场景文件路径列表
+        :return:
+        """
+        def load():
+            for path in paths:
+                self.go_through_all(path, {}, callback=Project.callback)
+        self._execute(load)
+        self.save_cache()
+
+    def _run_in_processes(self, chunk_size=20):
+        """
+            边扫描边把场景文件按chunk_size分块交给进程池，各进程复用同一个项目对象与连接
+            各块完成后按场景文件顺序写入结果：先完成的块等它之前的块都写入后再写
+        """
+        params = dict(self._params, processes=1)
+        self.get_engine()
+        order = {}
+        worker_stats = {}
+        futures = []
+        done_chunks = {}    # 已完成、尚未写入的块：块序号 -> 用例结果
+        next_chunk = [0]
+        lock = threading.Lock()
+
+        def on_done(index, future):
+            if future.exception() is None:
+                results, pid, stats = future.result()
+                worker_stats[pid] = stats
+            else:
+                # 出错的块没有结果，不能挡住之后的块，异常在最后的future.result()中抛出
+                results = []
+            with lock:
+                done_chunks[index] = results
+                while next_chunk[0] in done_chunks:
+                    # 子进程内多线程执行时块内结果按完成顺序，按场景文件顺序重排，同一场景的用例保持原顺序
+                    for result in sorted(done_chunks.pop(next_chunk[0]), key=lambda r: order[r['path']]):
+                        self.record_result(result)
+                    next_chunk[0] += 1
+
+        def submit(paths):
+            future = executor.submit(_run_shard, paths)
+            future.add_done_callback(functools.partial(on_done, len(futures)))
+            return future
+
+        with ProcessPoolExecutor(max_workers=self.processes, initializer=_init_worker,
+                                 initargs=(type(self), params, self.cookie_users)) as executor:
+            chunk = []
+            for path, _ in self.iter_scene_files():
+                order[path] = len(order)
+                chunk.append(path)
+                if len(chunk) >= chunk_size:
+                    futures.append(submit(chunk))
+                    chunk = []
+            if chunk:
+                futures.append(submit(chunk))
+        for future in futures:
+            future.result()
+        for stats in worker_stats.values():
+            self.session_pool.stats.merge(stats)
+
+    def report(self):
+        """
+            输出执行结果统计，配置了report_path时将按场景、按URL的耗时分位数写入json文件；
+            用例结果已逐行写入results_path时只记录该文件路径，否则一并写入用例结果
+        :return: 耗时分位数等统计
+        """
+        summary = self._summary.to_dict()
+        total = summary['total']
+        logger.info('共执行%s个用例，出错%s个，耗时p50 %s秒，p99 %s秒' % (
+            total['count'], total['errors'], total['elapsed']['p50'], total['elapsed']['p99']))
+        if self.report_path:
+            f = open(self.report_path, 'w', encoding='utf-8')
+            data = {'summary': summary}
+            if self._streamed:
+                data['results_path'] = self.results_path
+            else:
+                data['results'] = self.results
+            f.write(json.dumps(data, indent=4, ensure_ascii=False))
+            f.close()
+            logger.info('执行结果已写入%s' % self.report_path)
+        return summary
 
     def get_scene_items(self):
         from .postman import Items
@@ -149,32 +543,79 @@ class Project:
         return items
 
     def create_scv(self):
-
-        def _callback_create_csv(project, scene, structure, path, **kwargs):
-            print('_callback_create_csv', project, scene, structure, path, kwargs)
-            dirpath, filename = os.path.split(path)
-            csv_path = os.path.join(dirpath, filename.replace('.json', '.csv'))
-            write_csv(csv_path, scene.to_csv())
-        self.load_scene(go_through_all=Project.go_through_all, target='json', callback_method=_callback_create_csv)
+        """
+            由json生成csv，只处理上次同步后有变化的文件对
+        """
+        return self.sync_case_files('json')
 
     def check_csv(self):
-        self.load_scene(go_through_all=Project.go_through_all, target='csv', callback_method=None)
+        """
+            载入各csv场景并逐行读出用例，csv中的用例按需读取，只载入场景不会发现有问题的行
+        """
+        def _callback_check_csv(project, scene, structure, path, **kwargs):
+            count = 0
+            for _ in scene.cases:
+                count += 1
+            logger.info('csv %s 检查通过，共%s个用例' % (path, count))
+        self.load_scene(go_through_all=Project.go_through_all, target='csv', callback_method=_callback_check_csv)
 
     def reset_json_by_csv(self):
-        def _callback_reset_json_by_csv(project, scene, structure, path, **kwargs):
-            dirpath, filename = os.path.split(path)
-            csv_path = os.path.join(dirpath, filename.replace('.json', '.csv'))
-            write_csv(csv_path, scene.to_csv())
-        self.load_scene(go_through_all=Project.go_through_all, target='csv',
-                        callback_method=_callback_reset_json_by_csv)
+        """
+            由csv(及原json)重新生成json，只处理上次同步后有变化的文件对
+            csv中没有的字段(header、用例的desc与response等)从原json保留
+        """
+        return self.sync_case_files('csv')
+
+    def sync_case_files(self, source):
+        """
+            在json与csv之间同步，source为来源一侧
+            配置了cache_dir时用同步清单跳过两侧都未变化、且上次同样由source生成的文件对，
+            结果与全部重新生成一致
+        :return: {'written': 写入数, 'skipped': 跳过数}
+        """
+        manifest = SyncManifest(self.cache_dir) if self.cache_dir else None
+        skipped = 0
+        with CaseFileWriter(workers=1) as writer:
+            for path, _ in self.iter_scene_files(source):
+                dirpath, filename = os.path.split(path)
+                name = filename[:-len(source) - 1]
+                json_path = os.path.join(dirpath, name + '.json')
+                csv_path = os.path.join(dirpath, name + '.csv')
+                json_hash, csv_hash = _digest(json_path), _digest(csv_path)
+                if manifest and manifest.unchanged(json_path, source, json_hash, csv_hash):
+                    skipped += 1
+                    continue
+                if source == 'json':
+                    scene = self.load_cached(json_path, Scene.load_from_file)
+                    content = dump_csv(scene.to_csv())
+                    writer.write(csv_path, content)
+                    csv_hash = hashlib.sha256(content).hexdigest()
+                else:
+                    scene = self.load_cached(csv_path, Scene.load_from_csv, depends=(json_path,))
+                    f = open(json_path, encoding='utf-8')
+                    try:
+                        data = scene.merge_into_dict(json.load(f))
+                    finally:
+                        f.close()
+                    content = json.dumps(data, indent=4, ensure_ascii=False).encode('utf-8')
+                    writer.write(json_path, content)
+                    json_hash = hashlib.sha256(content).hexdigest()
+                if manifest:
+                    manifest.record(json_path, source, json_hash, csv_hash)
+        self.save_cache()
+        if manifest:
+            manifest.save()
+        res = {'written': writer.written, 'skipped': writer.skipped + skipped}
+        logger.info('同步%s：写入%s个，未变化%s个' % (source, res['written'], res['skipped']))
+        return res
 
     @classmethod
-    def gen(cls):
+    def gen(cls, **kwargs):
         """
             重写此方法，以生产你项目所需对象
         :return:
         """
-        return cls()
+        return cls(**kwargs)
 
     def clean_db(self):
         """重写方法完成清理数据库动作"""
@@ -187,3 +628,46 @@ class Project:
     def init_db(self):
         """重写方法完成初始化数据库动作"""
         raise NotImplementedError
+
+
+def _url_path(url) -> str:
+    return urlsplit(url).path.rstrip('/') or '/'
+
+
+def _digest(path):
+    return file_digest(path) if os.path.exists(path) else None
+
+
+_worker_project = None
+
+
+def _init_worker(project_cls, params, cookie_users):
+    """
+        子进程初始化项目对象，使用父进程已登录的cookie
+    """
+    global _worker_project
+    _worker_project = project_cls.gen(**params)
+    _worker_project.cookie_users = cookie_users
+    # fork出的子进程退出时不执行atexit，multiprocessing的Finalize在进程池关闭、子进程正常退出时执行
+    Finalize(None, _close_worker, exitpriority=10)
+
+
+def _close_worker():
+    """
+        子进程退出前关闭Session池与aiohttp事件循环
+    """
+    if _worker_project is not None:
+        _worker_project.close(log_stats=False)
+
+
+def _run_shard(paths):
+    """
+        子进程中执行一块场景文件
+    :return: (用例结果, 进程号, 本进程累计的连接统计)
+    """
+    project = _worker_project
+    project.results = []
+    project._summary = SummaryAggregator()
+    project.run_files(paths)
+    project.get_engine()
+    return project.results, os.getpid(), project.session_pool.stats.to_dict()
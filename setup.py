@@ -17,6 +17,7 @@ setuptools.setup(
     keywords=["web", "api", "test", "postman"],
     packages=setuptools.find_packages(),
     install_requires=['requests'],
+    extras_require={'async': ['aiohttp']},
     python_requires=">=3.3",
     license="MIT",
     classifiers=[
@@ -1,3 +1,4 @@
+import sys
 from enum import Enum
 from dataclasses import dataclass
 from typing import Any, Optional, List, Union, Dict, TypeVar, Callable, Type, cast
@@ -5,7 +6,7 @@ from typing import Any, Optional, List, Union, Dict, TypeVar, Callable, Type, ca
 __all__ = (
     'Enum', 'dataclass', 'Any', 'Optional', 'List', 'Union', 'Dict', 'TypeVar', 'Callable', 'Type', 'cast', 'T', 'EnumT',
     'from_str', 'from_none', 'from_union', 'to_enum', 'from_list', 'to_class', 'from_bool', 'from_int', 'from_dict',
-    'from_float', 'to_float'
+    'from_float', 'to_float', 'slotted_dataclass'
 )
 
 T = TypeVar("T")
@@ -69,3 +70,13 @@ def from_float(x: Any) -> float:
 def to_float(x: Any) -> float:
     assert isinstance(x, float)
     return x
+
+
+def slotted_dataclass(cls):
+    """
+        python3.10以上生成带__slots__的数据类，实例不再有__dict__；更早的版本退化为普通数据类
+        注意生成的是新类，类中的方法不能使用无参数的super()
+    """
+    if sys.version_info >= (3, 10):
+        return dataclass(cls, slots=True)
+    return dataclass(cls)
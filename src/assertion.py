@@ -0,0 +1,210 @@
+"""
+    用例的响应断言
+    Case.response为断言列表，场景载入时编译为匹配器，执行时逐个检查；响应体只在有json或regex断言时完整保留，json最多解析一次
+        {"status": 200}                                 状态码，也可为列表 [200, 201]
+        {"header": "Content-Type", "match": "json"}     响应头存在，给定match时需匹配该正则
+        {"json": "data.items[0].id", "equals": 1}       json路径的值等于equals
+        {"json": "data.tags", "contains": "a"}          json路径的值(字符串、列表或字典)包含contains，两者都不给时只要求路径存在
+        {"regex": "\"ok\":\\s*true"}                    响应体匹配正则
+        {"max_latency": 0.5}                            总耗时(秒)不超过该值
+"""
+import re
+import json
+
+_MISSING = object()
+_UNSET = object()
+_PATH_TOKEN = re.compile(r'\[(\d+)\]|([^.\[\]]+)')
+
+
+def compile_path(path) -> tuple:
+    """
+        'data.items[0].id' -> ('data', 'items', 0, 'id')，开头的'$.'可省略
+    """
+    if path.startswith('$'):
+        path = path[1:].lstrip('.')
+    return tuple(int(index) if index else key for index, key in _PATH_TOKEN.findall(path))
+
+
+def resolve_path(obj, keys):
+    """
+    :return: 路径对应的值，不存在时为_MISSING
+    """
+    for key in keys:
+        try:
+            if isinstance(obj, list):
+                obj = obj[int(key)]
+            elif isinstance(obj, dict):
+                obj = obj[str(key)]
+            else:
+                return _MISSING
+        except (KeyError, IndexError, ValueError):
+            return _MISSING
+    return obj
+
+
+class ResponseView:
+    """
+        一个响应的断言上下文，正文与json按需解码并缓存，多个断言共用
+    """
+    __slots__ = ('response', '_text', '_json')
+
+    def __init__(self, response):
+        self.response = response
+        self._text = None
+        self._json = _UNSET
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            response = self.response
+            body = getattr(response, 'full_content', None)
+            body = response.content if body is None else body
+            self._text = body.decode(response.encoding or 'utf-8', 'replace')
+        return self._text
+
+    @property
+    def json(self):
+        """
+        :return: 解析后的json，不是json时为_MISSING
+        """
+        if self._json is _UNSET:
+            try:
+                self._json = json.loads(self.text)
+            except ValueError:
+                self._json = _MISSING
+        return self._json
+
+
+class StatusMatcher:
+    __slots__ = ('statuses',)
+
+    def __init__(self, statuses):
+        self.statuses = frozenset(statuses)
+
+    def check(self, view, elapsed):
+        status = view.response.status_code
+        if status not in self.statuses:
+            return '状态码为%s，应为%s' % (status, '/'.join(str(s) for s in sorted(self.statuses)))
+
+
+class HeaderMatcher:
+    __slots__ = ('name', 'pattern')
+
+    def __init__(self, name, pattern=None):
+        self.name = name
+        self.pattern = re.compile(pattern) if pattern is not None else None
+
+    def check(self, view, elapsed):
+        value = view.response.headers.get(self.name)
+        if value is None:
+            return '缺少响应头%s' % self.name
+        if self.pattern is not None and not self.pattern.search(value):
+            return '响应头%s为%r，不匹配%r' % (self.name, value, self.pattern.pattern)
+
+
+class JsonMatcher:
+    __slots__ = ('path', 'keys', 'op', 'expected')
+
+    def __init__(self, path, op=None, expected=None):
+        self.path = path
+        self.keys = compile_path(path)
+        self.op = op
+        self.expected = expected
+
+    def check(self, view, elapsed):
+        data = view.json
+        if data is _MISSING:
+            return '响应体不是json'
+        value = resolve_path(data, self.keys)
+        if value is _MISSING:
+            return 'json路径%s不存在' % self.path
+        if self.op == 'equals':
+            if value != self.expected:
+                return 'json路径%s为%r，应等于%r' % (self.path, value, self.expected)
+        elif self.op == 'contains':
+            try:
+                found = self.expected in value
+            except TypeError:
+                found = False
+            if not found:
+                return 'json路径%s为%r，应包含%r' % (self.path, value, self.expected)
+
+
+class RegexMatcher:
+    __slots__ = ('pattern',)
+
+    def __init__(self, pattern):
+        self.pattern = re.compile(pattern)
+
+    def check(self, view, elapsed):
+        if not self.pattern.search(view.text):
+            return '响应体不匹配%r' % self.pattern.pattern
+
+
+class LatencyMatcher:
+    __slots__ = ('seconds',)
+
+    def __init__(self, seconds):
+        self.seconds = float(seconds)
+
+    def check(self, view, elapsed):
+        if elapsed is not None and elapsed > self.seconds:
+            return '耗时%.3f秒，超过%s秒' % (elapsed, self.seconds)
+
+
+def compile_matcher(spec):
+    if not isinstance(spec, dict):
+        raise ValueError('assertion should be a dict, got %r' % (spec,))
+    if 'status' in spec:
+        status = spec['status']
+        return StatusMatcher(status if isinstance(status, (list, tuple)) else [status])
+    if 'header' in spec:
+        return HeaderMatcher(spec['header'], spec.get('match'))
+    if 'json' in spec:
+        for op in ('equals', 'contains'):
+            if op in spec:
+                return JsonMatcher(spec['json'], op, spec[op])
+        return JsonMatcher(spec['json'])
+    if 'regex' in spec:
+        return RegexMatcher(spec['regex'])
+    if 'max_latency' in spec:
+        return LatencyMatcher(spec['max_latency'])
+    raise ValueError('unknown assertion %r, should have one of status, header, json, regex, max_latency' % (spec,))
+
+
+class Expectation:
+    """
+        一个用例编译后的全部断言，不可变，可在线程间共享
+    """
+    __slots__ = ('matchers', 'has_status', 'needs_body')
+
+    def __init__(self, matchers):
+        self.matchers = tuple(matchers)
+        self.has_status = any(isinstance(m, StatusMatcher) for m in self.matchers)
+        self.needs_body = any(isinstance(m, (JsonMatcher, RegexMatcher)) for m in self.matchers)
+
+    @classmethod
+    def compile(cls, specs):
+        """
+        :param specs: Case.response
+        :return: Expectation，没有断言时为None
+        """
+        if not specs:
+            return None
+        if isinstance(specs, dict):
+            specs = [specs]
+        return cls(compile_matcher(spec) for spec in specs)
+
+    def check(self, response) -> list:
+        """
+        :return: 未通过的断言说明，全部通过时为空列表
+        """
+        view = ResponseView(response)
+        metrics = getattr(response, 'metrics', None)
+        elapsed = metrics.get('elapsed') if metrics else None
+        failures = []
+        for matcher in self.matchers:
+            failure = matcher.check(view, elapsed)
+            if failure is not None:
+                failures.append(failure)
+        return failures
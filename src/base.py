@@ -1,27 +1,61 @@
 import json
+import dataclasses
+from collections.abc import Mapping, ItemsView
 from ._typing import *
 from .utils import logger
 
 __all__ = (
     'json', 'Enum', 'dataclass', 'Any', 'Optional', 'List', 'Union', 'Dict', 'TypeVar', 'Callable', 'Type', 'cast', 'T', 'EnumT',
     'from_str', 'from_none', 'from_union', 'to_enum', 'from_list', 'to_class', 'from_bool', 'from_int', 'from_dict',
-    'from_float', 'to_float', 'DataClassMixin', 'FileLoaderMixin', 'Case'
+    'from_float', 'to_float', 'slotted_dataclass', 'DataClassMixin', 'FileLoaderMixin', 'Case', 'SharedKeyParams'
 )
 
 
+MISSING = object()
+_FIELD_TABLES = {}
+
+
+def field_table(cls):
+    """
+        类自身注解的字段及类属性上的默认值(无默认值为MISSING)，每个类只生成一次
+    :return: ((字段名, 默认值), ...)
+    """
+    try:
+        return _FIELD_TABLES[cls]
+    except KeyError:
+        pass
+    if dataclasses.is_dataclass(cls):
+        # 带__slots__的数据类的默认值不在类属性上
+        defaults = {f.name: MISSING if f.default is dataclasses.MISSING else f.default
+                    for f in dataclasses.fields(cls)}
+        table = tuple((key, defaults.get(key, MISSING)) for key in cls.__dict__['__annotations__'])
+    else:
+        table = tuple((key, getattr(cls, key, MISSING)) for key in cls.__dict__['__annotations__'])
+    _FIELD_TABLES[cls] = table
+    return table
+
+
 class DataClassMixin:
+    __slots__ = ()
+
     def get_changed_keys(self):
-        res = []
-        for key in self.__class__.__dict__['__annotations__']:
-            if hasattr(self.__class__, key):
-                if getattr(self.__class__, key) is not getattr(self, key):
-                    res.append(key)
-            else:
-                res.append(key)
-        return res
+        """
+            没有默认值，或值不是默认值对象本身的字段
+        """
+        return [key for key, default in field_table(self.__class__)
+                if default is MISSING or default is not getattr(self, key)]
+
+    def pick_changed(self, result: dict) -> dict:
+        """
+            只保留result中字段发生了变化的键，顺序不变
+        """
+        changed = set(self.get_changed_keys())
+        return {k: v for k, v in result.items() if k in changed}
 
 
 class FileLoaderMixin:
+    __slots__ = ()
+
     @classmethod
     def load_from_file(cls, path):
         logger.info('load scene from file %s' % path)
@@ -38,27 +72,92 @@ class FileLoaderMixin:
             raise e
 
 
-@dataclass
+class _SharedKeyItems(ItemsView):
+    __slots__ = ()
+
+    def __iter__(self):
+        return zip(self._mapping._keys, self._mapping._values)
+
+
+class SharedKeyParams(Mapping):
+    """
+        用例参数的紧凑表示：键相同的用例共用同一个键元组，每个用例只保存值元组
+        只读，用法同dict
+    """
+    __slots__ = ('_keys', '_values')
+
+    def __init__(self, keys, values):
+        self._keys = keys
+        self._values = values
+
+    @classmethod
+    def from_dict(cls, params, key_table=None):
+        """
+        :param key_table: {键元组: 键元组}，传入时相同的键元组只保留一份
+        """
+        keys = tuple(params)
+        if key_table is not None:
+            keys = key_table.setdefault(keys, keys)
+        return cls(keys, tuple(params.values()))
+
+    def __getitem__(self, key):
+        try:
+            return self._values[self._keys.index(key)]
+        except ValueError:
+            raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def items(self):
+        return _SharedKeyItems(self)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def __reduce__(self):
+        return self.__class__, (self._keys, self._values)
+
+
+_case_encoder = None
+
+
+@slotted_dataclass
 class Case(DataClassMixin):
     name: str
-    params: dict
+    params: dict    # dict或SharedKeyParams
     desc: str = None
-    response: list = None
+    response: Union[list, dict, None] = None   # 响应断言，见src/assertion.py
 
     @staticmethod
-    def from_dict(obj: Any) -> 'Case':
+    def from_dict(obj: Any, key_table=None) -> 'Case':
+        """
+        :param key_table: 传入时参数保存为共用键元组的SharedKeyParams
+        """
         name = from_str(obj.get("name"))
-        params = dict(obj.get('params'))
+        params = obj.get('params')
+        params = dict(params) if key_table is None else SharedKeyParams.from_dict(params, key_table)
         desc = obj.get('desc')
-        return Case(name, params, desc)
+        response = obj.get('response')
+        return Case(name, params, desc, response)
 
     def to_dict(self) -> dict:
-        result = {}
-        result['name'] = self.name
-        result['params'] = self.params
-        result['desc'] = self.desc
-        result['response'] = self.response
-        return {k: result[k] for k in result if k in self.get_changed_keys()}
+        """
+            使用按注解生成的编码函数，输出与逐个字段pick_changed一致
+        """
+        global _case_encoder
+        if _case_encoder is None:
+            # encoder依赖本模块，只能在使用时导入
+            from .encoder import class_encoder
+            _case_encoder = class_encoder(Case)
+        return _case_encoder(self)
 
     def get_payload(self):
         return self.params
+
+    def share_keys(self, key_table):
+        if isinstance(self.params, dict):
+            self.params = SharedKeyParams.from_dict(self.params, key_table)
@@ -0,0 +1,83 @@
+"""
+    已解析场景的本地缓存
+    以文件路径、修改时间、大小和webapitest版本为键，命中时直接反序列化，跳过json解析与校验
+"""
+import os
+import pickle
+import hashlib
+from .. import __version__
+from .utils import atomic_write, logger
+
+# 模型类的存储结构变化时递增，使旧缓存失效
+CACHE_FORMAT = 4
+
+
+class SceneCache:
+    """
+        每个场景一个条目文件，文件名为场景路径的hash，命中时只读取该场景的条目
+        条目各自原子替换，多个进程同时保存互不覆盖，保存的开销只与本次新解析的场景数有关
+        条目保存序列化后的字节，每次命中都反序列化出新对象
+    """
+    entries_dir = 'scenes'
+
+    def __init__(self, root):
+        self.root = root
+        self.hits = 0
+        self.misses = 0
+        self._changed = {}
+
+    def entry_path(self, path) -> str:
+        digest = hashlib.sha1(os.path.abspath(path).encode('utf-8', 'surrogateescape')).hexdigest()
+        return os.path.join(self.root, self.entries_dir, digest[:2], digest + '.pickle')
+
+    def _read_entry(self, entry_path):
+        try:
+            with open(entry_path, 'rb') as f:
+                version, key, data = pickle.load(f)
+            if version == (__version__, CACHE_FORMAT):
+                return key, data
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.info('scene cache error: %s, message: %s' % (entry_path, str(e)))
+        return None
+
+    @staticmethod
+    def _stat_key(path):
+        st = os.stat(path)
+        return os.path.abspath(path), st.st_mtime_ns, st.st_size
+
+    def load(self, path, loader, depends=()):
+        """
+        :param path: 场景文件路径
+        :param loader: 未命中时的载入方法 loader(path)
+        :param depends: 载入还依赖的其它文件，任一文件变化都会使缓存失效
+        :return:
+        """
+        key = tuple(self._stat_key(p) for p in (path,) + tuple(depends))
+        entry_path = self.entry_path(path)
+        entry = self._read_entry(entry_path)
+        if entry is not None and entry[0] == key:
+            try:
+                obj = pickle.loads(entry[1])
+            except Exception as e:
+                logger.info('scene cache error: %s, message: %s' % (path, str(e)))
+            else:
+                self.hits += 1
+                return obj
+        self.misses += 1
+        obj = loader(path)
+        self._changed[entry_path] = (key, pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+        return obj
+
+    def save(self):
+        """
+            写入本次新解析的场景条目，先写临时文件再改名
+        :return:
+        """
+        for entry_path, (key, data) in self._changed.items():
+            dirpath = os.path.dirname(entry_path)
+            os.makedirs(dirpath, exist_ok=True)
+            atomic_write(entry_path, pickle.dumps(((__version__, CACHE_FORMAT), key, data),
+                                                  protocol=pickle.HIGHEST_PROTOCOL))
+        self._changed = {}
@@ -1,4 +1,5 @@
 from .base import *
+from .encoder import encode
 
 
 @dataclass
@@ -23,7 +24,7 @@ class ApikeyElement:
         result["key"] = from_str(self.key)
         result["value"] = self.value
         result["type"] = from_union([from_str, from_none], self.type)
-        return {k:result[k] for k in result if k in self.get_changed_keys()}
+        return self.pick_changed(result)
 
 
 class AuthType(Enum):
@@ -111,7 +112,7 @@ class Auth(DataClassMixin):
                                       self.oauth1)
         result["oauth2"] = from_union([lambda x: from_list(lambda x: to_class(ApikeyElement, x), x), from_none],
                                       self.oauth2)
-        return {k:result[k] for k in result if k in self.get_changed_keys()}
+        return self.pick_changed(result)
 
 
 @dataclass
@@ -130,7 +131,7 @@ class PathClass(DataClassMixin):
         result: dict = {}
         result["type"] = from_union([from_str, from_none], self.type)
         result["value"] = from_union([from_str, from_none], self.value)
-        return {k:result[k] for k in result if k in self.get_changed_keys()}
+        return self.pick_changed(result)
 
 
 @dataclass
@@ -158,10 +159,10 @@ class Description(DataClassMixin):
         result["version"] = self.version
         result["content"] = from_union([from_str, from_none], self.content)
         result["type"] = from_union([from_str, from_none], self.type)
-        return {k:result[k] for k in result if k in self.get_changed_keys()}
+        return self.pick_changed(result)
 
 
-@dataclass
+@slotted_dataclass
 class QueryParam(DataClassMixin):
     description: Union[Description, None, str] = None
     """If set to true, the current query parameter will not be sent with the request."""
@@ -184,7 +185,7 @@ class QueryParam(DataClassMixin):
         result["disabled"] = from_union([from_bool, from_none], self.disabled)
         result["key"] = from_union([from_none, from_str], self.key)
         result["value"] = from_union([from_none, from_str], self.value)
-        return {k:result[k] for k in result if k in self.get_changed_keys()}
+        return self.pick_changed(result)
 
 
 class VariableType(Enum):
@@ -249,7 +250,7 @@ class Variable(DataClassMixin):
         result["name"] = from_union([from_str, from_none], self.name)
         result["system"] = from_union([from_bool, from_none], self.system)
         result["type"] = from_union([lambda x: to_enum(VariableType, x), from_none], self.type)
-        return {k:result[k] for k in result if k in self.get_changed_keys()}
+        return self.pick_changed(result)
 
 
 @dataclass
@@ -310,7 +311,7 @@ class URLClass(DataClassMixin):
         result["raw"] = from_union([from_str, from_none], self.raw)
         result["variable"] = from_union([lambda x: from_list(lambda x: to_class(Variable, x), x), from_none],
                                         self.variable)
-        return {k: result[k] for k in result if k in self.get_changed_keys()}
+        return self.pick_changed(result)
 
     def get_params(self):
         res = {}
@@ -372,7 +373,7 @@ class Script(DataClassMixin):
         result["id"] = from_union([from_str, from_none], self.id)
         result["name"] = from_union([from_str, from_none], self.name)
         result["type"] = from_union([from_str, from_none], self.type)
-        return {k:result[k] for k in result if k in self.get_changed_keys()}
+        return self.pick_changed(result)
 
 
 @dataclass
@@ -405,7 +406,7 @@ class Event(DataClassMixin):
         result["disabled"] = from_union([from_bool, from_none], self.disabled)
         result["id"] = from_union([from_str, from_none], self.id)
         result["script"] = from_union([lambda x: to_class(Script, x), from_none], self.script)
-        return {k:result[k] for k in result if k in self.get_changed_keys()}
+        return self.pick_changed(result)
 
 
 @dataclass
@@ -441,7 +442,7 @@ class CollectionVersionClass(DataClassMixin):
         result["minor"] = from_int(self.minor)
         result["patch"] = from_int(self.patch)
         result["identifier"] = from_union([from_str, from_none], self.identifier)
-        return {k:result[k] for k in result if k in self.get_changed_keys()}
+        return self.pick_changed(result)
 
 
 @dataclass
@@ -484,7 +485,7 @@ class Information(DataClassMixin):
         result["version"] = from_union([lambda x: to_class(CollectionVersionClass, x), from_str, from_none],
                                        self.version)
         result["_postman_id"] = from_union([from_str, from_none], self.postman_id)
-        return {k:result[k] for k in result if k in self.get_changed_keys()}
+        return self.pick_changed(result)
 
 
 @dataclass
@@ -503,7 +504,7 @@ class File(DataClassMixin):
         result: dict = {}
         result["content"] = from_union([from_str, from_none], self.content)
         result["src"] = from_union([from_none, from_str], self.src)
-        return {k:result[k] for k in result if k in self.get_changed_keys()}
+        return self.pick_changed(result)
 
 
 class FormParameterType(Enum):
@@ -544,7 +545,7 @@ class FormParameter(DataClassMixin):
         result["disabled"] = from_union([from_bool, from_none], self.disabled)
         result["type"] = from_union([lambda x: to_enum(FormParameterType, x), from_none], self.type)
         result["value"] = from_union([from_str, from_none], self.value)
-        return {k:result[k] for k in result if k in self.get_changed_keys()}
+        return self.pick_changed(result)
 
 
 class Mode(Enum):
@@ -578,7 +579,7 @@ class URLEncodedParameter(DataClassMixin):
         result["key"] = from_str(self.key)
         result["disabled"] = from_union([from_bool, from_none], self.disabled)
         result["value"] = from_union([from_str, from_none], self.value)
-        return {k:result[k] for k in result if k in self.get_changed_keys()}
+        return self.pick_changed(result)
 
 
 @dataclass
@@ -618,7 +619,7 @@ class Body(DataClassMixin):
         result["raw"] = from_union([from_str, from_none], self.raw)
         result["urlencoded"] = from_union(
             [lambda x: from_list(lambda x: to_class(URLEncodedParameter, x), x), from_none], self.urlencoded)
-        return {k:result[k] for k in result if k in self.get_changed_keys()}
+        return self.pick_changed(result)
 
 
 @dataclass
@@ -636,7 +637,7 @@ class CERT(DataClassMixin):
     def to_dict(self) -> dict:
         result: dict = {}
         result["src"] = self.src
-        return {k:result[k] for k in result if k in self.get_changed_keys()}
+        return self.pick_changed(result)
 
 
 @dataclass
@@ -654,7 +655,7 @@ class Key(DataClassMixin):
     def to_dict(self) -> dict:
         result: dict = {}
         result["src"] = self.src
-        return {k:result[k] for k in result if k in self.get_changed_keys()}
+        return self.pick_changed(result)
 
 
 @dataclass
@@ -688,10 +689,10 @@ class Certificate(DataClassMixin):
         result["matches"] = from_union([lambda x: from_list(lambda x: x, x), from_none], self.matches)
         result["name"] = from_union([from_str, from_none], self.name)
         result["passphrase"] = from_union([from_str, from_none], self.passphrase)
-        return {k:result[k] for k in result if k in self.get_changed_keys()}
+        return self.pick_changed(result)
 
 
-@dataclass
+@slotted_dataclass
 class Header(DataClassMixin):
     """A representation for a list of headers
 
@@ -715,12 +716,10 @@ class Header(DataClassMixin):
         return Header(description, key, value, disabled)
 
     def to_dict(self) -> dict:
-        result: dict = {}
-        result["description"] = from_union([lambda x: to_class(Description, x), from_none, from_str], self.description)
-        result["key"] = from_str(self.key)
-        result["value"] = from_str(self.value)
-        result["disabled"] = from_union([from_bool, from_none], self.disabled)
-        return {k:result[k] for k in result if k in self.get_changed_keys()}
+        """
+            使用按注解生成的编码函数，输出与逐个字段from_union一致
+        """
+        return encode(self)
 
 
 @dataclass
@@ -756,7 +755,7 @@ class ProxyConfig(DataClassMixin):
         result["match"] = from_union([from_str, from_none], self.match)
         result["port"] = from_union([from_int, from_none], self.port)
         result["tunnel"] = from_union([from_bool, from_none], self.tunnel)
-        return {k:result[k] for k in result if k in self.get_changed_keys()}
+        return self.pick_changed(result)
 
 
 @dataclass
@@ -823,4 +822,4 @@ class Cookie(DataClassMixin):
         result["secure"] = from_union([from_bool, from_none], self.secure)
         result["session"] = from_union([from_bool, from_none], self.session)
         result["value"] = from_union([from_str, from_none], self.value)
-        return {k:result[k] for k in result if k in self.get_changed_keys()}
+        return self.pick_changed(result)
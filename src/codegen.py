@@ -0,0 +1,130 @@
+"""
+    decoder与encoder共用的代码生成：
+    把注解转换为 {值类型: 转换函数} 的类型表，按类型表拼出逐字段分支的源码，再像dataclass生成__init__一样exec
+    每个类只生成一次，支持引用自身的注解(如Items.item)
+"""
+import typing
+import threading
+
+JSON_TYPES = (type(None), bool, int, float, str, list, dict)
+# 生成的代码中JSON类型的名字
+TYPE_NAMES = {json_type: '_%s' % json_type.__name__ for json_type in JSON_TYPES}
+
+
+def fail(tp, x):
+    raise AssertionError('expected %s, got %s' % (getattr(tp, '__name__', tp), type(x).__name__))
+
+
+def build_table(tp, leaf, converter) -> dict:
+    """
+        把注解转换为 {值类型: 转换函数}，转换函数为None表示原样返回
+    :param leaf: leaf(tp)返回非泛型注解(基本类型、枚举、数据类等)的类型表，不支持时返回None
+    :param converter: converter(tp)返回单个注解的转换函数，用于列表元素与字典值
+    """
+    if tp is typing.Any:
+        return dict.fromkeys(JSON_TYPES)
+    table = leaf(tp)
+    if table is not None:
+        return table
+    origin = getattr(tp, '__origin__', None)
+    args = getattr(tp, '__args__', ())
+    if origin is typing.Union:
+        # 同一值类型有多个候选时取注解中靠前的一个
+        res = {}
+        for arg in args:
+            for value_type, f in build_table(arg, leaf, converter).items():
+                res.setdefault(value_type, f)
+        return res
+    if origin is list:
+        if args[0] is typing.Any:
+            return {list: list}
+        item = converter(args[0])
+        return {list: lambda x: [item(y) for y in x]}
+    if origin is dict:
+        if args[1] is typing.Any:
+            return {dict: dict}
+        value = converter(args[1])
+        return {dict: lambda x: {k: value(v) for k, v in x.items()}}
+    raise TypeError('unsupported annotation %s' % tp)
+
+
+def table_converter(tp, table):
+    """
+        按类型表查找转换函数，类型不在表中时失败
+    """
+    def convert(x):
+        try:
+            f = table[type(x)]
+        except KeyError:
+            fail(tp, x)
+        return x if f is None else f(x)
+    return convert
+
+
+def dispatch_source(index, tp, table, target, namespace, indent='    ') -> list:
+    """
+        生成按type(x)分支的代码，转换结果赋给target；转换函数为None的分支直接取值
+        转换函数与非JSON类型放入namespace，名字带上字段序号index
+    """
+    groups = {}
+    for value_type, f in table.items():
+        groups.setdefault(f, []).append(value_type)
+    lines = ['%st = type(x)' % indent]
+    keyword = 'if'
+    for n, (f, value_types) in enumerate(groups.items()):
+        names = []
+        for value_type in value_types:
+            type_name = TYPE_NAMES.get(value_type)
+            if type_name is None:
+                type_name = 'c%s_%s_%s' % (index, n, len(names))
+                namespace[type_name] = value_type
+            names.append('t is %s' % type_name)
+        lines.append('%s%s %s:' % (indent, keyword, ' or '.join(names)))
+        if f is None:
+            lines.append('%s    %s = x' % (indent, target))
+        else:
+            namespace['f%s_%s' % (index, n)] = f
+            lines.append('%s    %s = f%s_%s(x)' % (indent, target, index, n))
+        keyword = 'elif'
+    namespace['tp%s' % index] = tp
+    lines += ['%selse:' % indent, '%s    fail(tp%s, x)' % (indent, index)]
+    return lines
+
+
+class ClassCodegen:
+    """
+        为数据类生成并缓存函数：source(cls, namespace)返回名为name的函数源码，exec后取出
+        生成时先登记一个转发函数，供引用自身的注解使用；整棵类型树生成完成后才对其他线程可见
+    """
+
+    def __init__(self, name, source):
+        self.name = name
+        self.source = source
+        self._functions = {}
+        self._building = {}
+        self._lock = threading.RLock()
+
+    def __call__(self, cls):
+        try:
+            return self._functions[cls]
+        except KeyError:
+            pass
+        with self._lock:
+            if cls in self._functions:
+                return self._functions[cls]
+            if cls in self._building:
+                return self._building[cls]
+            outermost = not self._building
+            namespace = {'cls': cls, 'fail': fail}
+            self._building[cls] = lambda obj: namespace[self.name](obj)
+            try:
+                lines = self.source(cls, namespace)
+                namespace.update((name, json_type) for json_type, name in TYPE_NAMES.items())
+                exec('\n'.join(lines), namespace)
+                self._building[cls] = namespace[self.name]
+                if outermost:
+                    self._functions.update(self._building)
+            finally:
+                if outermost:
+                    self._building.clear()
+            return namespace[self.name]
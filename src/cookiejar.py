@@ -0,0 +1,96 @@
+"""
+    登录cookie的本地缓存
+    记录各用户登录得到的cookie及其过期时间，后续执行复用未过期的cookie，只为过期或被拒绝的用户重新登录
+"""
+import os
+import json
+import time
+import hashlib
+from .utils import read_json_file, save_json_file
+
+
+def login_digest(method, url, kwargs) -> str:
+    """
+        登录请求的摘要，登录地址、账号密码或环境变量变化后旧cookie不再复用
+    """
+    data = json.dumps([method, url, kwargs], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def response_cookie(response, cookie_key):
+    """
+        从登录响应中取出名为cookie_key的cookie
+    :return: ('name=value', 过期时间戳)，没有该cookie时返回(None, None)；会话cookie的过期时间为None
+    """
+    for cookie in response.cookies:
+        if cookie.name == cookie_key:
+            return '%s=%s' % (cookie.name, cookie.value), cookie.expires
+    return None, None
+
+
+class CookieJar:
+    """
+        {用户: {'cookie': 'name=value', 'expires': 过期时间戳|None, 'login': 登录请求摘要}}
+        文件中保存的是登录凭证，权限设为仅当前用户可读写
+        会话cookie没有过期时间，保存时以max_age秒后为过期时间；max_age为None时不限
+    """
+    jar_name = 'cookies.json'
+
+    def __init__(self, root, margin=30, max_age=None):
+        self.root = root
+        self.margin = margin    # 距过期不足margin秒的cookie视为已过期
+        self.max_age = max_age
+        self._entries = None
+        self._changed = {}
+
+    @property
+    def jar_path(self):
+        return os.path.join(self.root, self.jar_name)
+
+    def _read(self) -> dict:
+        return read_json_file(self.jar_path, 'cookie jar')
+
+    def get(self, user, login):
+        """
+        :param login: 本次登录请求的摘要，与记录不一致时视为没有cookie
+        :return: 仍然有效的cookie，没有时返回None
+        """
+        if self._entries is None:
+            self._entries = self._read()
+        entry = self._entries.get(user)
+        if not entry or entry.get('login') != login:
+            return None
+        expires = entry.get('expires')
+        if expires is None and self.max_age is not None:
+            # 未限制复用时长时保存的会话cookie
+            return None
+        if expires is not None and expires <= time.time() + self.margin:
+            return None
+        return entry['cookie']
+
+    def set(self, user, cookie, expires, login):
+        if self._entries is None:
+            self._entries = self._read()
+        if expires is None and self.max_age is not None:
+            expires = time.time() + self.max_age
+        entry = {'cookie': cookie, 'expires': expires, 'login': login}
+        self._entries[user] = entry
+        self._changed[user] = entry
+
+    def discard(self, user):
+        """
+            cookie被服务端拒绝时删除，下次执行重新登录
+        """
+        if self._entries is None:
+            self._entries = self._read()
+        self._entries.pop(user, None)
+        self._changed[user] = None
+
+    def save(self):
+        """
+            合并磁盘上的记录后原子替换，多个进程同时登录时互不覆盖
+        """
+        if not self._changed:
+            return
+        self._entries = save_json_file(self.jar_path, self._changed, name='cookie jar')
+        self._changed = {}
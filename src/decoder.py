@@ -0,0 +1,81 @@
+"""
+    按数据类注解生成的解码表
+    每个类只在第一次解码时根据注解生成一次字段表，解码时按JSON值的类型直接查表选中转换函数，
+    不再像from_union那样依次尝试转换函数、以断言失败作为分支，结果与from_dict生成的对象一致
+    postman.py中RequestClass、ResponseClass、Items与Collection的from_dict都由此解码，结果与逐个字段用from_union解码一致
+"""
+import re
+import typing
+import dataclasses
+from enum import Enum
+from .codegen import JSON_TYPES, ClassCodegen, build_table, dispatch_source, table_converter
+
+# 与驼峰规则不一致的JSON字段名
+JSON_KEYS = {
+    'postman_id': '_postman_id',
+}
+_CAMEL = re.compile(r'_([a-z])')
+
+
+def json_key(name):
+    try:
+        return JSON_KEYS[name]
+    except KeyError:
+        return _CAMEL.sub(lambda m: m.group(1).upper(), name)
+
+
+def _leaf_table(tp):
+    """
+        非泛型注解的 {JSON值类型: 转换函数}
+    """
+    if tp is float:
+        return {int: float, float: float}
+    if tp in JSON_TYPES:
+        return {tp: None}
+    if isinstance(tp, type) and issubclass(tp, Enum):
+        return dict.fromkeys({type(m.value) for m in tp}, tp)
+    if dataclasses.is_dataclass(tp):
+        return {dict: class_decoder(tp)}
+    return None
+
+
+def _table(tp) -> dict:
+    return build_table(tp, _leaf_table, converter)
+
+
+def converter(tp):
+    """
+        生成单个注解的转换函数
+    """
+    if dataclasses.is_dataclass(tp):
+        return class_decoder(tp)
+    return table_converter(tp, _table(tp))
+
+
+def _source(cls, namespace) -> list:
+    """
+        解码函数的源码：逐个字段按JSON值类型分支，字段按dataclass定义顺序以位置参数传入
+    """
+    hints = typing.get_type_hints(cls)
+    fields = [f for f in dataclasses.fields(cls) if f.init]
+    lines = ['def decode(obj):',
+             '    if type(obj) is not dict:',
+             '        fail(dict, obj)',
+             '    get = obj.get']
+    for index, f in enumerate(fields):
+        tp = hints[f.name]
+        lines.append('    x = get(%r)' % json_key(f.name))
+        if tp is typing.Any:
+            lines.append('    v%s = x' % index)
+        else:
+            lines += dispatch_source(index, tp, _table(tp), 'v%s' % index, namespace)
+    lines.append('    return cls(%s)' % ', '.join('v%s' % i for i in range(len(fields))))
+    return lines
+
+
+# 为数据类生成解码函数
+class_decoder = ClassCodegen('decode', _source)
+
+
+def decode(cls, obj):
+    return class_decoder(cls)(obj)
@@ -0,0 +1,81 @@
+"""
+    按数据类注解生成的编码表，与decoder相对
+    每个类只生成一次编码函数：默认值取自base.field_table，按值的类型直接选中转换函数，
+    未变化的字段不再计算，输出与各类生成的to_dict逐字节一致
+"""
+import typing
+import dataclasses
+from enum import Enum
+from .base import MISSING, field_table, SharedKeyParams
+from .codegen import JSON_TYPES, ClassCodegen, build_table, dispatch_source, table_converter
+from .decoder import json_key
+
+
+def _value(x):
+    return x.value
+
+
+def _shared_params(x):
+    return dict(x.items())
+
+
+def _leaf_table(tp):
+    """
+        非泛型注解的 {值类型: 转换函数}
+    """
+    if tp is dict:
+        # Case.params可能是共用键元组的SharedKeyParams
+        return {dict: None, SharedKeyParams: _shared_params}
+    if tp in JSON_TYPES:
+        return {tp: None}
+    if isinstance(tp, type) and issubclass(tp, Enum):
+        return {tp: _value}
+    if dataclasses.is_dataclass(tp):
+        return {tp: class_encoder(tp)}
+    return None
+
+
+def _table(tp) -> dict:
+    return build_table(tp, _leaf_table, converter)
+
+
+def converter(tp):
+    """
+        生成单个注解的转换函数
+    """
+    return table_converter(tp, _table(tp))
+
+
+def _source(cls, namespace) -> list:
+    """
+        编码函数的源码：逐个字段按值类型分支，值是默认值对象本身时跳过
+        生成的to_dict用字段名过滤JSON键，驼峰或改名的字段(如originalRequest、_postman_id)从不输出，这里保持一致
+    """
+    hints = typing.get_type_hints(cls)
+    # init=False的字段是运行时状态(如Scene.project)，不输出
+    runtime = {f.name for f in dataclasses.fields(cls) if not f.init}
+    lines = ['def encode(self):', '    result = {}']
+    for index, (name, default) in enumerate(field_table(cls)):
+        if json_key(name) != name or name in runtime:
+            continue
+        tp = hints[name]
+        lines.append('    x = self.%s' % name)
+        indent = '    '
+        if default is not MISSING:
+            namespace['d%s' % index] = default
+            lines.append('    if x is not d%s:' % index)
+            indent = '        '
+        if tp is typing.Any:
+            lines.append('%sresult[%r] = x' % (indent, name))
+        else:
+            lines += dispatch_source(index, tp, _table(tp), 'result[%r]' % name, namespace, indent)
+    lines.append('    return result')
+    return lines
+
+
+# 为数据类生成编码函数
+class_encoder = ClassCodegen('encode', _source)
+
+
+def encode(obj) -> dict:
+    return class_encoder(type(obj))(obj)
@@ -0,0 +1,407 @@
+"""
+    请求执行引擎
+    sync: 逐个使用requests发送请求（默认）
+    asyncio: 所有场景的请求共用一个事件循环，需安装aiohttp
+    两个引擎都支持连接/读取超时、幂等方法的重试与按host熔断
+"""
+import time
+import types
+import asyncio
+import hashlib
+import datetime
+import threading
+import concurrent.futures
+from urllib.parse import urlsplit
+import requests
+from urllib3.exceptions import ReadTimeoutError
+from requests.structures import CaseInsensitiveDict
+from requests.cookies import RequestsCookieJar, morsel_to_cookie
+from requests.utils import get_encoding_from_headers, get_netrc_auth
+from .resilience import RetryPolicy, CircuitBreaker
+from .utils import logger
+
+# 可以重试的异常
+RETRY_EXCEPTIONS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+
+
+def _host_down(e) -> bool:
+    """
+        连接失败或连接超时计入熔断；读取响应体时的超时被requests包装为ConnectionError，需要排除
+    """
+    if isinstance(e, requests.ReadTimeout) or not isinstance(e, requests.ConnectionError):
+        return False
+    return not (e.args and isinstance(e.args[0], ReadTimeoutError))
+
+
+def _url_with_params(url, params) -> str:
+    """
+        与requests一致地把查询参数编码进url：布尔等值按str转换，值为None的参数省略
+        aiohttp只接受str、int、float类型的参数值
+    """
+    request = requests.PreparedRequest()
+    request.prepare_url(url, params)
+    return request.url
+
+
+def request_metrics(method, url, elapsed, ttfb, size, reused) -> dict:
+    """
+    :param elapsed: 总耗时(秒)，含读取响应体
+    :param ttfb: 收到响应头的耗时(秒)
+    :param size: 响应体字节数
+    :param reused: 是否复用了已有连接
+    """
+    return {'method': method, 'url': url, 'elapsed': elapsed, 'ttfb': ttfb, 'bytes': size, 'reused': reused}
+
+
+class BodyCapture:
+    """
+        分块读取响应体：计算sha256，只保留前limit个字节，limit为None时保留全部
+    """
+    chunk_size = 65536
+
+    def __init__(self, limit=None):
+        self.limit = limit
+        self.size = 0
+        self.prefix = bytearray()
+        self._hash = hashlib.sha256()
+
+    def feed(self, chunk):
+        self.size += len(chunk)
+        self._hash.update(chunk)
+        if self.limit is None:
+            self.prefix += chunk
+        elif len(self.prefix) < self.limit:
+            self.prefix += chunk[:self.limit - len(self.prefix)]
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+
+def _captured(response, content, keep_body, limit) -> bytes:
+    """
+        保留完整响应体时另存于response.full_content
+    :return: 截断为limit个字节的响应体
+    """
+    if keep_body:
+        response.full_content = content
+        if limit is not None:
+            return content[:limit]
+    return content
+
+
+class SyncEngine:
+    """
+        从SessionPool借出Session逐个发送请求，复用keep-alive连接
+    """
+
+    def __init__(self, session_pool, body_capture=None, timeout=None, retry=None, breaker=None):
+        """
+        :param timeout: (连接超时, 读取超时)秒，None为不限
+        :param retry: RetryPolicy，默认不重试
+        :param breaker: CircuitBreaker，默认不熔断
+        """
+        self.session_pool = session_pool
+        self.body_capture = body_capture
+        self.timeout = timeout
+        self.retry = retry or RetryPolicy(retries=0)
+        self.breaker = breaker or CircuitBreaker(threshold=0)
+
+    def request(self, method, url, user=None, **kwargs):
+        """
+            按重试策略发送，重试次数记录在response.metrics['retries']
+            host熔断时抛出CircuitOpenError
+        """
+        return self._retry(method, url, lambda: self._send(method, url, user, **kwargs))
+
+    def send(self, prepared, user=None):
+        """
+            发送PreparedCase，同request，但不再拼接url与编码参数
+        """
+        return self._retry(prepared.method, prepared.url, lambda: self._send_prepared(prepared, user))
+
+    def _retry(self, method, url, send):
+        host = urlsplit(url).netloc
+        attempts = self.retry.attempts(method)
+        for attempt in range(attempts):
+            self.breaker.check(host)
+            try:
+                response = send()
+            except RETRY_EXCEPTIONS as e:
+                if _host_down(e):
+                    self.breaker.failure(host)
+                if attempt + 1 >= attempts:
+                    raise
+                logger.info('请求%s %s失败：%s，第%s次重试' % (method, url, str(e), attempt + 1))
+            else:
+                self.breaker.success(host)
+                if attempt + 1 >= attempts or response.status_code not in self.retry.statuses:
+                    response.metrics['retries'] = attempt
+                    return response
+                logger.info('请求%s %s返回%s，第%s次重试' % (method, url, response.status_code, attempt + 1))
+            time.sleep(self.retry.delay(attempt))
+
+    def _send(self, method, url, user=None, **kwargs):
+        with self.session_pool.borrow(url, user) as session:
+            start = time.perf_counter()
+            response = session.request(method, url, stream=True, timeout=self.timeout, **kwargs)
+            return self._read(response, method, url, start)
+
+    def _send_prepared(self, prepared, user=None):
+        """
+            复制预先编码好的请求，只合并Session的默认请求头，跳过requests的url与参数处理
+        """
+        with self.session_pool.borrow(prepared.url, user) as session:
+            request = requests.PreparedRequest()
+            request.method = prepared.method
+            request.url = prepared.url
+            request.body = prepared.body
+            request.headers = CaseInsensitiveDict(session.headers)
+            request.headers.update(prepared.headers)
+            # 跟随重定向时requests从这里合并cookie
+            request._cookies = RequestsCookieJar()
+            settings, auth = self._environment(session, prepared.url)
+            if auth:
+                request.prepare_auth(auth, prepared.url)
+            start = time.perf_counter()
+            response = session.send(request, timeout=self.timeout, **settings)
+            return self._read(response, prepared.method, prepared.scene_url, start, prepared.keep_body)
+
+    @staticmethod
+    def _environment(session, url):
+        """
+            与session.request一致，取环境变量中的代理与证书(REQUESTS_CA_BUNDLE等)及netrc认证
+            Session按host分组，每个Session只取一次
+        :return: (session.send的代理、证书等参数, netrc认证或None)
+        """
+        environment = getattr(session, 'webapitest_environment', None)
+        if environment is None:
+            settings = session.merge_environment_settings(url, {}, True, None, None)
+            auth = session.auth or (get_netrc_auth(url) if session.trust_env else None)
+            environment = session.webapitest_environment = (settings, auth)
+        return environment
+
+    def _read(self, response, method, url, start, keep_body=False):
+        """
+            流式读取响应体，response.content只保留body_capture个字节，完整响应体的哈希记录在response.body_sha256
+        :param keep_body: 完整响应体另存于response.full_content，供断言使用
+        """
+        capture = BodyCapture(None if keep_body else self.body_capture)
+        for chunk in response.iter_content(BodyCapture.chunk_size):
+            capture.feed(chunk)
+        response._content = _captured(response, bytes(capture.prefix), keep_body, self.body_capture)
+        response._content_consumed = True
+        response.close()
+        elapsed = time.perf_counter() - start
+        response.body_sha256 = capture.hexdigest()
+        response.metrics = request_metrics(method, url, elapsed, response.elapsed.total_seconds(),
+                                           capture.size, getattr(response, 'connection_reused', None))
+        return response
+
+    def iter_prepared(self, prepared, user=None):
+        """
+            逐个发送PreparedCase
+        :param user: 场景用户，不同用户使用不同的Session
+        :return: 每完成一个请求产出(序号, 响应)，请求失败时产出异常对象，不影响其余请求
+        """
+        return self._iter(lambda p: self.send(p, user), prepared)
+
+    @staticmethod
+    def _iter(send, items):
+        for index, item in enumerate(items):
+            try:
+                response = send(item)
+            except Exception as e:
+                response = e
+            yield index, response
+
+    def request_all(self, request_args, user=None) -> list:
+        """
+        :return: 与request_args顺序一致的响应列表，任一请求失败时抛出异常
+        """
+        return [self.request(method, url, user, **kwargs) for method, url, kwargs in request_args]
+
+    def close(self):
+        self.session_pool.close()
+
+
+class AsyncioEngine:
+    """
+        事件循环运行在独立线程中，任意线程调用request_all都会把请求交给同一个循环，
+        并用信号量限制同时在途的请求数
+    """
+
+    def __init__(self, concurrency=100, max_connections=10, stats=None, body_capture=None, timeout=None,
+                 retry=None, breaker=None):
+        try:
+            import aiohttp
+        except ImportError:
+            raise ImportError('asyncio引擎依赖aiohttp，请先执行 pip install webapitest[async]')
+        self._aiohttp = aiohttp
+        self._retry_exceptions = (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError)
+        # 连接被拒绝或重置(ClientOSError，含ClientConnectorError)与连接超时计入熔断；
+        # 较早的aiohttp没有ConnectionTimeoutError，连接超时与读取超时无法区分，都不计入
+        self._down_exceptions = (aiohttp.ClientOSError, getattr(aiohttp, 'ConnectionTimeoutError',
+                                                                aiohttp.ClientOSError))
+        self.concurrency = concurrency
+        self.max_connections = max_connections
+        self.stats = stats
+        self.body_capture = body_capture
+        self.timeout = timeout
+        self.retry = retry or RetryPolicy(retries=0)
+        self.breaker = breaker or CircuitBreaker(threshold=0)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='webapitest-asyncio', daemon=True)
+        self._thread.start()
+        self._session, self._semaphore = self.run(self._setup())
+
+    def run(self, coro):
+        """
+            在引擎的事件循环中执行协程，阻塞等待结果
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    async def _setup(self):
+        aiohttp = self._aiohttp
+        trace_configs = []
+        if self.stats is not None:
+            trace_config = aiohttp.TraceConfig()
+            trace_config.on_connection_create_end.append(self._on_connection_create)
+            trace_config.on_connection_reuseconn.append(self._on_connection_reuse)
+            trace_configs.append(trace_config)
+        connect, read = self.timeout or (None, None)
+        # 各用户通过Cookie头区分登录态，会话本身不能记录cookie
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.max_connections),
+            cookie_jar=aiohttp.DummyCookieJar(),
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=connect, sock_read=read),
+            trace_configs=trace_configs
+        )
+        return session, asyncio.Semaphore(self.concurrency)
+
+    async def _on_connection_create(self, session, context, params):
+        context.trace_request_ctx.reused = False
+        self.stats.record(1)
+
+    async def _on_connection_reuse(self, session, context, params):
+        self.stats.record(0)
+
+    def iter_prepared(self, prepared, user=None):
+        """
+            发送PreparedCase，按完成顺序产出(序号, 响应)，请求失败时产出异常对象
+            prepared按需取用，同时交给事件循环的请求不超过concurrency个，可以是很长的生成器
+        """
+        return self._iter(self.send(p) for p in prepared)
+
+    def _iter(self, coroutines):
+        pending = {}
+        coroutines = enumerate(coroutines)
+
+        def submit():
+            for index, coroutine in coroutines:
+                pending[asyncio.run_coroutine_threadsafe(coroutine, self._loop)] = index
+                if len(pending) >= self.concurrency:
+                    return
+
+        submit()
+        while pending:
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                error = future.exception()
+                yield pending.pop(future), future.result() if error is None else error
+            submit()
+
+    def request_all(self, request_args, user=None) -> list:
+        return self.run(self._gather(request_args))
+
+    async def _gather(self, request_args):
+        return await asyncio.gather(*[self.request(method, url, **kwargs) for method, url, kwargs in request_args])
+
+    async def request(self, method, url, params=None, data=None, headers=None):
+        """
+            同SyncEngine.request，重试等待期间不占用并发数
+        """
+        return await self._retry(method, url, lambda: self._send(method, url, params, data, headers))
+
+    async def send(self, prepared):
+        """
+            发送PreparedCase，url已含查询参数，请求体为编码好的bytes
+        """
+        return await self._retry(prepared.method, prepared.url, lambda: self._send(
+            prepared.method, prepared.url, data=prepared.body, headers=prepared.headers, metrics_url=prepared.scene_url,
+            keep_body=prepared.keep_body))
+
+    async def _retry(self, method, url, send):
+        host = urlsplit(url).netloc
+        attempts = self.retry.attempts(method)
+        for attempt in range(attempts):
+            self.breaker.check(host)
+            try:
+                response = await send()
+            except self._retry_exceptions as e:
+                if isinstance(e, self._down_exceptions):
+                    self.breaker.failure(host)
+                if attempt + 1 >= attempts:
+                    raise
+                logger.info('请求%s %s失败：%s，第%s次重试' % (method, url, str(e) or type(e).__name__, attempt + 1))
+            else:
+                self.breaker.success(host)
+                if attempt + 1 >= attempts or response.status_code not in self.retry.statuses:
+                    response.metrics['retries'] = attempt
+                    return response
+                logger.info('请求%s %s返回%s，第%s次重试' % (method, url, response.status_code, attempt + 1))
+            await asyncio.sleep(self.retry.delay(attempt))
+
+    async def _send(self, method, url, params=None, data=None, headers=None, metrics_url=None, keep_body=False):
+        """
+        :param metrics_url: 统计中使用的url，默认为url
+        :param keep_body: 同SyncEngine._read
+        """
+        metrics_url = metrics_url or url
+        if params:
+            url = _url_with_params(url, params)
+        async with self._semaphore:
+            ctx = types.SimpleNamespace(reused=True if self.stats is not None else None)
+            start = time.perf_counter()
+            async with self._session.request(method, url, data=data, headers=headers,
+                                             trace_request_ctx=ctx) as resp:
+                ttfb = time.perf_counter() - start
+                capture = BodyCapture(None if keep_body else self.body_capture)
+                async for chunk in resp.content.iter_chunked(BodyCapture.chunk_size):
+                    capture.feed(chunk)
+                elapsed = time.perf_counter() - start
+                response = self._to_response(resp, b'', datetime.timedelta(seconds=ttfb))
+                response._content = _captured(response, bytes(capture.prefix), keep_body, self.body_capture)
+        response.body_sha256 = capture.hexdigest()
+        response.metrics = request_metrics(method, metrics_url, elapsed, ttfb, capture.size, ctx.reused)
+        return response
+
+    @staticmethod
+    def _to_response(resp, content, elapsed):
+        """
+            转换为requests.Response，Scene.run与Project.load_cookie无需区分引擎
+        """
+        response = requests.Response()
+        response.status_code = resp.status
+        response.reason = resp.reason
+        response.url = str(resp.url)
+        headers = CaseInsensitiveDict()
+        for key in resp.headers.keys():
+            if key not in headers:
+                # 与urllib3一致，同名头以", "合并
+                headers[key] = ', '.join(resp.headers.getall(key))
+        response.headers = headers
+        response.encoding = get_encoding_from_headers(headers)
+        response._content = content
+        response.elapsed = elapsed
+        # 合并后的Set-Cookie头无法可靠拆分，直接使用aiohttp解析出的cookie
+        for morsel in resp.cookies.values():
+            response.cookies.set_cookie(morsel_to_cookie(morsel))
+        # 跟随过的重定向，供Project.is_cookie_rejected识别跳转到登录页
+        response.history = [AsyncioEngine._to_response(r, b'', elapsed) for r in resp.history]
+        return response
+
+    def close(self):
+        self.run(self._session.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
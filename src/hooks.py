@@ -0,0 +1,61 @@
+"""
+    执行过程中的事件订阅
+    没有订阅者的事件对应属性为None，触发处只需判断一次 if hooks.request_end is not None，未使用时没有额外开销
+"""
+
+EVENTS = (
+    'scene_loaded',     # scene, path, seconds(载入耗时), bytes(场景文件大小)
+    'request_start',    # scene, case, method, url
+    'request_end',      # scene, case, result(状态码、耗时、ttfb、字节数等), response(出错时为None)
+    'scene_end',        # scene, seconds, count(用例数), errors(出错数)
+    'run_end',          # project, seconds, summary(同执行结果文件中的summary)
+)
+
+
+def _chain(subscribers):
+    def emit(**kwargs):
+        for subscriber in subscribers:
+            subscriber(**kwargs)
+    return emit
+
+
+class Hooks:
+    """
+        project.hooks.on('request_end', lambda scene, case, result, response: ...)
+        订阅者以关键字参数接收事件数据，参数见EVENTS；在执行场景的线程中同步调用，应尽快返回
+    """
+    __slots__ = EVENTS + ('_subscribers',)
+
+    def __init__(self):
+        self._subscribers = {event: [] for event in EVENTS}
+        for event in EVENTS:
+            setattr(self, event, None)
+
+    def _check(self, event):
+        if event not in self._subscribers:
+            raise ValueError('unknown event %s, should be one of %s' % (event, ', '.join(EVENTS)))
+
+    def _update(self, event):
+        subscribers = tuple(self._subscribers[event])
+        if not subscribers:
+            emit = None
+        elif len(subscribers) == 1:
+            emit = subscribers[0]
+        else:
+            emit = _chain(subscribers)
+        setattr(self, event, emit)
+
+    def on(self, event, subscriber=None):
+        """
+            订阅事件，也可作为装饰器使用：@project.hooks.on('scene_end')
+        """
+        self._check(event)
+        if subscriber is None:
+            return lambda f: self.on(event, f) or f
+        self._subscribers[event].append(subscriber)
+        self._update(event)
+
+    def off(self, event, subscriber):
+        self._check(event)
+        self._subscribers[event].remove(subscriber)
+        self._update(event)
@@ -0,0 +1,102 @@
+"""
+    增量读取大json文件：按需从文件读入，用JSONDecoder.raw_decode逐个解析值，
+    对象与数组可以逐个键、逐个元素地遍历，已处理的内容随即丢弃
+"""
+import json
+
+WHITESPACE = ' \t\n\r'
+NUMBER_CHARS = '0123456789.eE+-'   # 可以接在数字之后、使其继续的字符
+
+
+class JsonStream:
+    def __init__(self, f, chunk_size=1 << 20):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self, size=None):
+        """
+            丢弃已解析的部分并读入更多内容
+        :return: 是否读到了新内容
+        """
+        data = self.f.read(size or self.chunk_size)
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        if not data:
+            self.eof = True
+        return bool(data)
+
+    def peek(self):
+        """
+            跳过空白，返回下一个字符，文件结束返回''
+        """
+        while True:
+            buf = self.buf
+            pos = self.pos
+            while pos < len(buf) and buf[pos] in WHITESPACE:
+                pos += 1
+            self.pos = pos
+            if pos < len(buf):
+                return buf[pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, chars):
+        c = self.peek()
+        if not c or c not in chars:
+            raise json.JSONDecodeError('Expecting one of %r' % chars, self.buf, self.pos)
+        self.pos += 1
+        return c
+
+    def value(self):
+        """
+            解析下一个完整的值
+            内容不完整时按已缓冲的长度成倍读入后重新解析，整体仍是线性的
+        """
+        self.peek()
+        while True:
+            try:
+                obj, end = self._decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.eof or not self._fill(max(self.chunk_size, len(self.buf) - self.pos)):
+                    raise
+                continue
+            # 值恰好停在缓冲区末尾时可能还没读完；数字停在12.或1e处时raw_decode只解析出前半段
+            if end == len(self.buf) or (type(obj) in (int, float) and self.buf[end] in NUMBER_CHARS):
+                if not self.eof and self._fill():
+                    continue
+            self.pos = end
+            return obj
+
+    def iter_object(self):
+        """
+            逐个返回对象的键，调用方需在取下一个键之前用value()或其他方法消费掉对应的值
+        """
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            if not isinstance(key, str):
+                raise json.JSONDecodeError('Expecting property name', self.buf, self.pos)
+            self.expect(':')
+            yield key
+            if self.expect(',}') == '}':
+                return
+
+    def iter_array(self):
+        """
+            逐个位置遍历数组，调用方需在取下一个位置之前消费掉对应的元素
+        """
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield
+            if self.expect(',]') == ']':
+                return
@@ -0,0 +1,188 @@
+"""
+    压力测试：按目标请求速率(开环)回放场景文件中的用例
+    每个请求都有计划发出时间，耗时从计划时间算起，发压端排队造成的延迟也计入耗时，避免协同遗漏(coordinated omission)
+"""
+import time
+import itertools
+import random
+import asyncio
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from .engine import AsyncioEngine
+from .report import latency_summary
+from .scene import Scene
+from .utils import logger
+
+
+class LoadRecorder:
+    """
+        按完成时间把结果归入时间窗口，耗时从计划发出时间算起
+        每个窗口的耗时存为array('d')，每个请求只占8字节
+    """
+
+    def __init__(self, window=1.0):
+        self.window = window
+        self.windows = {}
+        self.last_end = 0
+        self._lock = threading.Lock()
+
+    def record(self, end_offset, latency, error):
+        with self._lock:
+            index = int(end_offset // self.window)
+            bucket = self.windows.get(index)
+            if bucket is None:
+                bucket = self.windows[index] = [array('d'), 0]
+            bucket[0].append(latency)
+            if error:
+                bucket[1] += 1
+            self.last_end = max(self.last_end, end_offset)
+
+    @staticmethod
+    def _summary(latencies, errors, seconds) -> dict:
+        return dict({
+            'requests': len(latencies),
+            'throughput': len(latencies) / seconds if seconds else 0,
+            'errors': errors,
+            'error_rate': errors / len(latencies) if latencies else 0,
+        }, **latency_summary(latencies))
+
+    def to_dict(self) -> dict:
+        windows = []
+        latencies = array('d')
+        errors = 0
+        for index in sorted(self.windows):
+            bucket_latencies, bucket_errors = self.windows[index]
+            windows.append(dict({'start': index * self.window},
+                                **self._summary(bucket_latencies, bucket_errors, self.window)))
+            latencies.extend(bucket_latencies)
+            errors += bucket_errors
+        return {'total': self._summary(latencies, errors, self.last_end), 'windows': windows}
+
+
+class LoadGenerator:
+    def __init__(self, project, rps, duration, window=1.0, seed=None):
+        """
+        :param project: 已登录(load_cookie)的项目
+        :param rps: 目标每秒请求数
+        :param duration: 持续秒数
+        :param window: 统计时间窗口秒数
+        """
+        self.project = project
+        self.rps = rps
+        self.duration = duration
+        self.recorder = LoadRecorder(window)
+        self.random = random.Random(seed)
+
+    def build_mix(self):
+        """
+            载入所有场景，渲染出每个用例的请求，权重取场景的weight
+        :return: ([(PreparedCase, user)], [权重])
+        """
+        requests_mix = []
+        weights = []
+        for path, _ in self.project.iter_scene_files():
+            scene = self.project.load_cached(path, Scene.load_from_file)
+            scene.set_project(self.project)
+            # 每个用例只编码一次，压测期间反复发送同一个PreparedCase
+            for prepared in scene.prepare():
+                requests_mix.append((prepared, scene.user))
+                weights.append(scene.weight if scene.weight is not None else 1)
+        self.project.save_cache()
+        return requests_mix, weights
+
+    def run(self) -> dict:
+        requests_mix, weights = self.build_mix()
+        if not requests_mix:
+            raise Exception('no case found in %s' % self.project.path)
+        total = int(self.rps * self.duration)
+        schedule = self.iter_schedule(requests_mix, weights, total)
+        logger.info('压力测试开始：%s个用例，目标%s请求/秒，持续%s秒' % (len(requests_mix), self.rps, self.duration))
+        engine = self.project.get_engine()
+        if isinstance(engine, AsyncioEngine):
+            engine.run(self._run_async(engine, schedule, total))
+        else:
+            self._run_threads(engine, schedule, total)
+        res = self.recorder.to_dict()
+        res['config'] = {'rps': self.rps, 'duration': self.duration, 'cases': len(requests_mix)}
+        summary = res['total']
+        logger.info('压力测试结束：实际%.1f请求/秒，出错率%.2f%%，耗时p50 %s秒，p99 %s秒' % (
+            summary['throughput'], summary['error_rate'] * 100, summary['p50'], summary['p99']))
+        return res
+
+    def iter_schedule(self, requests_mix, weights, total, batch=1024):
+        """
+            按权重逐批抽取要发送的用例，不预先生成rps*duration长的列表；抽取结果与一次抽取total个相同
+        """
+        cum_weights = list(itertools.accumulate(weights))
+        while total > 0:
+            k = min(batch, total)
+            yield from self.random.choices(requests_mix, cum_weights=cum_weights, k=k)
+            total -= k
+
+    def _finish(self, start, intended, response=None, error=None, expect=None):
+        """
+        :param expect: 用例的断言，有状态码断言时以它代替 状态码>=400 的判断
+        """
+        end = time.perf_counter()
+        if error is not None:
+            failed = True
+        elif expect is None:
+            failed = response.status_code >= 400
+        else:
+            failed = (not expect.has_status and response.status_code >= 400) or bool(expect.check(response))
+        self.recorder.record(end - start, end - intended, failed)
+
+    def _send_sync(self, engine, start, intended, item):
+        prepared, user = item
+        try:
+            response = engine.send(prepared, user)
+        except Exception as e:
+            self._finish(start, intended, error=e)
+        else:
+            self._finish(start, intended, response, expect=prepared.expect)
+
+    def _run_threads(self, engine, schedule, total):
+        """
+            调度线程按计划时间把请求交给线程池，线程数为project.concurrency
+        """
+        with ThreadPoolExecutor(max_workers=self.project.concurrency, thread_name_prefix='webapitest-load') as pool:
+            start = time.perf_counter()
+            sent = 0
+            while sent < total:
+                due = min(int((time.perf_counter() - start) * self.rps) + 1, total)
+                while sent < due:
+                    pool.submit(self._send_sync, engine, start, start + sent / self.rps, next(schedule))
+                    sent += 1
+                delay = start + sent / self.rps - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+    async def _send_async(self, engine, start, intended, item):
+        prepared, _ = item
+        try:
+            response = await engine.send(prepared)
+        except Exception as e:
+            self._finish(start, intended, error=e)
+        else:
+            self._finish(start, intended, response, expect=prepared.expect)
+
+    async def _run_async(self, engine, schedule, total):
+        """
+            在引擎的事件循环中按计划时间创建请求任务，同时在途数受引擎的concurrency限制
+        """
+        pending = set()
+        start = time.perf_counter()
+        sent = 0
+        while sent < total:
+            due = min(int((time.perf_counter() - start) * self.rps) + 1, total)
+            while sent < due:
+                task = asyncio.ensure_future(self._send_async(engine, start, start + sent / self.rps, next(schedule)))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+                sent += 1
+            delay = start + sent / self.rps - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        if pending:
+            await asyncio.gather(*pending)
@@ -0,0 +1,34 @@
+"""
+    预先构建好的请求
+    每个用例只渲染、编码一次：查询参数并入url，表单编码为bytes，请求头(含Cookie)固定下来，之后可反复发送
+"""
+from typing import Any, NamedTuple, Optional, Tuple
+
+
+class PreparedCase(NamedTuple):
+    """
+        不可变，可在线程间共享；headers为(键, 值)元组，发送时复制，不会因重复执行而增长
+    """
+    name: str
+    method: str
+    url: str
+    scene_url: str     # 场景中的url(不含查询参数)，统计按它分组
+    body: Optional[bytes]
+    headers: Tuple[Tuple[str, str], ...]
+    expect: Any = None      # 编译后的响应断言(assertion.Expectation)
+    keep_body: bool = False     # 断言需要完整响应体时为True，不受body_capture截断
+
+
+def prepare_case(name, method, url, kwargs, expect=None) -> PreparedCase:
+    """
+        用requests完成url拼接与表单编码
+    :param kwargs: Scene.iter_request_args产出的{'params'|'data': ..., 'headers': ...}
+    :param expect: 该用例的Expectation
+    """
+    import requests
+    prepared = requests.Request(method, url, **kwargs).prepare()
+    body = prepared.body
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    return PreparedCase(name, prepared.method, prepared.url, url, body, tuple(prepared.headers.items()),
+                        expect, expect is not None and expect.needs_body)
@@ -0,0 +1,188 @@
+"""
+    分阶段计时：目录扫描、场景解析、环境变量渲染、等待网络、日志等各自累计的耗时，可选cProfile与tracemalloc
+    未启用时phase()返回同一个空上下文，iter_phase()原样返回迭代器，几乎没有额外开销
+"""
+import json
+import time
+import logging
+import threading
+from contextlib import nullcontext
+from .utils import logger
+
+_active = None
+_NULL = nullcontext()
+
+
+def phase(name):
+    """
+        with phase('load'): ...
+        阶段嵌套时只记外层扣除内层后的耗时，各阶段之和不超过各线程的总耗时
+    """
+    profiler = _active
+    return _NULL if profiler is None else profiler.phase(name)
+
+
+def iter_phase(name, iterable):
+    """
+        只统计从iterable取下一个元素的耗时，循环体不计入
+    """
+    profiler = _active
+    return iterable if profiler is None else profiler.iter_phase(name, iterable)
+
+
+class _Phase:
+    __slots__ = ('profiler', 'name', 'start', 'child')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        stack = self.profiler._stack()
+        stack.append(self)
+        self.child = 0
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        elapsed = time.perf_counter() - self.start
+        stack = self.profiler._stack()
+        stack.pop()
+        if stack:
+            stack[-1].child += elapsed
+        self.profiler.add(self.name, elapsed - self.child)
+
+
+class Profiler:
+    """
+        with Profiler(cprofile=True, tracemalloc_top=20, output='local_profile') as profiler:
+            ...
+        退出时原始数据写入output.json，cProfile数据写入output.prof，summary()为各阶段耗时汇总
+        cProfile只记录启用它的线程(主线程)，各阶段耗时则包含所有线程
+    """
+
+    def __init__(self, cprofile=False, tracemalloc_top=0, output='local_profile'):
+        self.cprofile = cprofile
+        self.tracemalloc_top = tracemalloc_top
+        self.output = output
+        self.phases = {}
+        self.wall = None
+        self.allocations = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._profile = None
+        self._start = None
+
+    def _stack(self) -> list:
+        try:
+            return self._local.stack
+        except AttributeError:
+            self._local.stack = []
+            return self._local.stack
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+    def iter_phase(self, name, iterable):
+        it = iter(iterable)
+        try:
+            while True:
+                with _Phase(self, name):
+                    try:
+                        item = next(it)
+                    except StopIteration:
+                        return
+                yield item
+        finally:
+            close = getattr(it, 'close', None)
+            if close:
+                close()
+
+    def add(self, name, seconds):
+        with self._lock:
+            stat = self.phases.get(name)
+            if stat is None:
+                self.phases[name] = [seconds, 1]
+            else:
+                stat[0] += seconds
+                stat[1] += 1
+
+    def _timed_handle(self, record):
+        with _Phase(self, 'logging'):
+            logging.Logger.handle(logger, record)
+
+    def start(self):
+        global _active
+        if self.tracemalloc_top:
+            import tracemalloc
+            tracemalloc.start()
+        # 日志的格式化与输出都在handle中完成
+        logger.handle = self._timed_handle
+        _active = self
+        if self.cprofile:
+            import cProfile
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        self._start = time.perf_counter()
+
+    def stop(self):
+        global _active
+        self.wall = time.perf_counter() - self._start
+        if self._profile is not None:
+            self._profile.disable()
+        _active = None
+        del logger.handle
+        if self.tracemalloc_top:
+            import tracemalloc
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            self.allocations = [{
+                'file': stat.traceback[0].filename,
+                'line': stat.traceback[0].lineno,
+                'size': stat.size,
+                'count': stat.count,
+            } for stat in snapshot.statistics('lineno')[:self.tracemalloc_top]]
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+        self.save()
+
+    def to_dict(self) -> dict:
+        return {
+            'wall_seconds': self.wall,
+            'phases': {name: {'seconds': seconds, 'calls': calls} for name, (seconds, calls) in self.phases.items()},
+            'allocations': self.allocations,
+            'cprofile': self.output + '.prof' if self._profile is not None else None,
+        }
+
+    def save(self):
+        if not self.output:
+            return
+        if self._profile is not None:
+            self._profile.dump_stats(self.output + '.prof')
+        f = open(self.output + '.json', 'w', encoding='utf-8')
+        f.write(json.dumps(self.to_dict(), indent=4, ensure_ascii=False))
+        f.close()
+
+    def summary(self) -> str:
+        """
+            各阶段按耗时从多到少排列，多线程执行时阶段耗时是各线程之和，可能超过总耗时
+        """
+        lines = ['总耗时 %.3fs' % self.wall]
+        for name, (seconds, calls) in sorted(self.phases.items(), key=lambda x: -x[1][0]):
+            lines.append('  %-10s %9.3fs %6.1f%% %8s次' % (name, seconds, seconds * 100 / self.wall if self.wall else 0,
+                                                        calls))
+        other = self.wall - sum(seconds for seconds, _ in self.phases.values())
+        if other >= 0:
+            lines.append('  %-10s %9.3fs %6.1f%%' % ('other', other, other * 100 / self.wall if self.wall else 0))
+        if self.allocations:
+            lines.append('内存分配最多的位置：')
+            for item in self.allocations:
+                lines.append('  %10.1fKB %8s个  %s:%s' % (item['size'] / 1024, item['count'], item['file'], item['line']))
+        if self.output:
+            lines.append('原始数据已写入%s.json%s' % (self.output, '、%s.prof' % self.output if self._profile else ''))
+        return '\n'.join(lines)
@@ -0,0 +1,122 @@
+"""
+    执行结果统计：按场景、按URL汇总耗时分位数
+"""
+import json
+import math
+import threading
+from array import array
+
+
+def percentile(sorted_values, p):
+    """
+        最近秩法，sorted_values需已升序
+    """
+    if not sorted_values:
+        return None
+    index = max(int(math.ceil(p / 100.0 * len(sorted_values))) - 1, 0)
+    return sorted_values[index]
+
+
+def latency_summary(values) -> dict:
+    values = sorted(values)
+    return {
+        'p50': percentile(values, 50),
+        'p90': percentile(values, 90),
+        'p99': percentile(values, 99),
+        'max': values[-1] if values else None,
+    }
+
+
+class GroupStats:
+    """
+        一组用例结果的累计统计，耗时存为array('d')，每个用例只占16字节
+    """
+    __slots__ = ('count', 'errors', 'bytes', 'reused', 'elapsed', 'ttfb')
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.bytes = 0
+        self.reused = 0
+        self.elapsed = array('d')
+        self.ttfb = array('d')
+
+    def add(self, r):
+        self.count += 1
+        if 'error' in r:
+            self.errors += 1
+        if 'elapsed' in r:
+            self.bytes += r['bytes']
+            if r.get('reused'):
+                self.reused += 1
+            self.elapsed.append(r['elapsed'])
+            self.ttfb.append(r['ttfb'])
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'bytes': self.bytes,
+            'reused': self.reused,
+            'elapsed': latency_summary(self.elapsed),
+            'ttfb': latency_summary(self.ttfb),
+        }
+
+
+class SummaryAggregator:
+    """
+        逐个累计用例结果，不保留结果本身，多线程共用
+    """
+
+    def __init__(self):
+        self.total = GroupStats()
+        self.scenes = {}    # 场景文件: (场景名, GroupStats)
+        self.urls = {}
+        self._lock = threading.Lock()
+
+    def add(self, r):
+        with self._lock:
+            self.total.add(r)
+            key = r.get('path') or r['scene']
+            scene = self.scenes.get(key)
+            if scene is None:
+                scene = self.scenes[key] = (r['scene'], GroupStats())
+            scene[1].add(r)
+            if 'url' in r:
+                key = '%s %s' % (r['method'], r['url'])
+                group = self.urls.get(key)
+                if group is None:
+                    group = self.urls[key] = GroupStats()
+                group.add(r)
+
+    def to_dict(self) -> dict:
+        """
+        :return: {'total': {...}, 'scenes': {场景文件: {...}}, 'urls': {'GET url': {...}}}
+        """
+        with self._lock:
+            return {
+                'total': self.total.to_dict(),
+                'scenes': {key: dict(scene=name, **group.to_dict()) for key, (name, group) in self.scenes.items()},
+                'urls': {key: group.to_dict() for key, group in self.urls.items()},
+            }
+
+
+class JsonlResultWriter:
+    """
+        每完成一个用例写入一行json，多线程共用
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'w', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def write(self, result: dict):
+        line = json.dumps(result, ensure_ascii=False) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
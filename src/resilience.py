@@ -0,0 +1,86 @@
+"""
+    请求的重试与熔断
+    只对幂等方法重试，间隔按指数退避并加随机抖动；同一host连续失败达到阈值后熔断，其余请求直接失败，不再等待超时
+"""
+import time
+import random
+import threading
+from .utils import logger
+
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE', 'TRACE'])
+
+
+class CircuitOpenError(Exception):
+    """
+        host已熔断，请求未发出
+    """
+
+
+class RetryPolicy:
+    """
+        连接失败、超时及statuses中的状态码可重试，重试前等待 random(0, min(backoff_max, backoff * 2 ** 第几次))秒
+    """
+
+    def __init__(self, retries=2, backoff=0.2, backoff_max=5, statuses=(502, 503, 504)):
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.statuses = frozenset(statuses)
+
+    def attempts(self, method) -> int:
+        """
+        :return: 该方法最多发送的次数
+        """
+        if self.retries > 0 and method.upper() in IDEMPOTENT_METHODS:
+            return self.retries + 1
+        return 1
+
+    def delay(self, attempt) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """
+        按host计连续失败次数，达到threshold后熔断reset_timeout秒；
+        之后放行一个请求试探，成功则恢复，失败则继续熔断。threshold为0时不熔断
+        只有建立连接失败(拒绝连接、连接超时等)计为失败；读取超时只说明该接口慢，由读取超时限制，
+        服务端返回的任何状态码都说明host可用
+    """
+
+    def __init__(self, threshold=5, reset_timeout=30):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._hosts = {}    # host: [连续失败次数, 熔断开始时间]
+        self._lock = threading.Lock()
+
+    def check(self, host):
+        """
+            熔断中抛出CircuitOpenError
+        """
+        if not self.threshold:
+            return
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None or state[0] < self.threshold:
+                return
+            now = time.monotonic()
+            if now - state[1] < self.reset_timeout:
+                raise CircuitOpenError('%s连续失败%s次，已熔断' % (host, state[0]))
+            # 放行这一个请求试探，其余请求在它完成前继续直接失败
+            state[1] = now
+
+    def success(self, host):
+        if self._hosts:
+            with self._lock:
+                self._hosts.pop(host, None)
+
+    def failure(self, host):
+        if not self.threshold:
+            return
+        with self._lock:
+            state = self._hosts.setdefault(host, [0, 0])
+            state[0] += 1
+            if state[0] >= self.threshold:
+                state[1] = time.monotonic()
+            if state[0] == self.threshold:
+                logger.warning('%s连续失败%s次，%s秒内的请求直接失败' % (host, state[0], self.reset_timeout))
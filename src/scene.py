@@ -1,9 +1,58 @@
 import re
 import os
-import requests
+import time
+from dataclasses import field
 from .base import *
 from .case import Header
-from .utils import read_csv, logger
+from .template import RenderPlan
+from .prepared import prepare_case
+from .assertion import Expectation
+from .encoder import class_encoder
+from .profiler import iter_phase
+from .utils import iter_csv, logger
+
+SCENE_CSV_ATTRS = {
+    '场景名': 'name',
+    'URL': 'url',
+    '用户': 'user',
+}
+CASE_CSV_HEADER = 'CASE名'
+
+
+def case_from_csv_row(line) -> Case:
+    """
+        csv用例行：用例名, K1, V1, K2, V2 ...，用例较少的参数以空单元格补齐
+    """
+    return Case(name=line[0], params={k: v for k, v in zip(line[1::2], line[2::2]) if k})
+
+
+def _csv_text(value) -> str:
+    """
+        值写入csv后的文本，与csv.writer一致
+    """
+    return '' if value is None else str(value)
+
+
+class CsvCaseSource:
+    """
+        按需从csv逐行读取用例，每次遍历重新打开文件，内存占用与行数无关
+        文件格式同to_csv，CASE名行之前的场景属性行被忽略
+    """
+
+    def __init__(self, path, ref=None):
+        self.path = path
+        self.ref = ref  # 场景json中cases引用的csv路径(相对json所在目录)，to_dict时原样写回
+
+    def __iter__(self):
+        started = False
+        for line in iter_csv(self.path):
+            if not started:
+                started = bool(line) and line[0] == CASE_CSV_HEADER
+            elif any(line):
+                yield case_from_csv_row(line)
+
+    def __repr__(self):
+        return 'CsvCaseSource(%r)' % self.path
 
 
 @dataclass
@@ -16,7 +65,7 @@ class EnvironParam(DataClassMixin):
         return {'key': self.key, 'value': self.value}
 
 
-@dataclass
+@slotted_dataclass
 class Scene(DataClassMixin, FileLoaderMixin):
     """
         场景
@@ -29,6 +78,14 @@ class Scene(DataClassMixin, FileLoaderMixin):
     method: Optional[str]#MethodEnum
     cases: List[Case]
     header: List[Header] = None
+    weight: Optional[float] = None  # 压力测试时场景内每个用例被选中的权重，默认1
+    # 以下为运行时状态，由set_project设置，不参与构造、比较与序列化
+    project: Any = field(default=None, init=False, repr=False, compare=False)
+    plan: Any = field(default=None, init=False, repr=False, compare=False)
+    _envs: list = field(default=None, init=False, repr=False, compare=False)
+    _user_cookie: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+    _prepared: Any = field(default=None, init=False, repr=False, compare=False)   # ((plan, cookie), [PreparedCase])
+    _expects: Optional[list] = field(default=None, init=False, repr=False, compare=False)   # 与cases对应的Expectation
 
     @property
     def envs(self):
@@ -79,7 +136,35 @@ class Scene(DataClassMixin, FileLoaderMixin):
         self.project = project
         self.set_envs(project.envs)
         if self.user:
-            self.set_user_cookie(project.cookie_users[self.user])
+            # 未登录成功的用户等同于未登录
+            self.set_user_cookie(project.cookie_users.get(self.user))
+        self.compile()
+
+    def share_case_keys(self, key_table=None):
+        """
+            参数键相同的用例共用一个键元组(SharedKeyParams)，用例很多时减少内存
+        :param key_table: 多个场景传入同一个字典时跨场景共用
+        """
+        if isinstance(self.cases, list):
+            key_table = {} if key_table is None else key_table
+            for case in self.cases:
+                case.share_keys(key_table)
+
+    def compile(self):
+        """
+            编译环境变量模板与各用例的响应断言，未定义的变量在载入时提示
+        :return:
+        """
+        self._expects = None
+        if isinstance(self.cases, list) and any(case.response for case in self.cases):
+            try:
+                self._expects = [Expectation.compile(case.response) for case in self.cases]
+            except (ValueError, TypeError, re.error) as e:
+                raise ValueError('场景%s的断言有误：%s' % (self.name, e))
+        self.plan = RenderPlan(self.envs)
+        self.plan.compile_scene(self)
+        if self.plan.unknown and (self.project is None or self.project.check_envs):
+            logger.warning('场景%s中存在未定义的环境变量：%s' % (self.name, ', '.join(sorted(self.plan.unknown))))
 
     @staticmethod
     def from_dict(obj: Any) -> 'Scene':
@@ -88,16 +173,55 @@ class Scene(DataClassMixin, FileLoaderMixin):
         user = obj.get("user", None)
         # method = MethodEnum(obj.get('method'))
         method = obj.get('method')
-        cases = from_list(Case.from_dict, obj.get('cases'))
-        return Scene(name, url, user, method, cases)
+        cases = obj.get('cases')
+        if isinstance(cases, str):
+            # 数据驱动：用例在csv文件中，执行时逐行读取
+            cases = CsvCaseSource(cases, ref=cases)
+        else:
+            cases = from_list(Case.from_dict, cases)
+        weight = from_union([from_float, from_none], obj.get('weight'))
+        return Scene(name, url, user, method, cases, weight=weight)
 
     def to_dict(self) -> dict:
         result = {}
         result['name'] = self.name
         result['url'] = self.url
         result['method'] = self.method# to_enum(MethodEnum, self.method)
-        result['cases'] = from_list(lambda x: to_class(Case, x), self.cases)
-        return {k: result[k] for k in result if k in self.get_changed_keys()}
+        if isinstance(self.cases, CsvCaseSource) and self.cases.ref:
+            result['cases'] = self.cases.ref
+        else:
+            encode_case = class_encoder(Case)
+            result['cases'] = [encode_case(x) for x in self.cases]
+        result['weight'] = self.weight
+        return self.pick_changed(result)
+
+    def merge_into_dict(self, obj) -> dict:
+        """
+            把csv可编辑的部分(场景属性、用例名称与参数)合并进原json字典，header、用例的desc与response等其余字段保留
+            用例按名称对应原json中的用例，csv新增的用例只有名称与参数；参数值与原值写入csv后的文本相同时保留原值
+        :param obj: 原json字典，不会被修改
+        """
+        result = dict(obj)
+        for attr in SCENE_CSV_ATTRS.values():
+            value = getattr(self, attr)
+            if value is not None:
+                result[attr] = value
+        if isinstance(obj.get('cases'), str):
+            # 数据驱动的场景用例本就在csv中
+            return result
+        old_cases = {}
+        for case in obj.get('cases') or ():
+            old_cases.setdefault(case.get('name'), case)
+        cases = []
+        for case in self.cases:
+            item = dict(old_cases.get(case.name, ()))
+            old_params = item.get('params') or {}
+            item['name'] = case.name
+            item['params'] = {k: old_params[k] if k in old_params and _csv_text(old_params[k]) == v else v
+                              for k, v in case.params.items()}
+            cases.append(item)
+        result['cases'] = cases
+        return result
 
     def to_csv(self):
         """
@@ -122,39 +246,36 @@ class Scene(DataClassMixin, FileLoaderMixin):
         res.extend(cases_data)
         return res
 
+    @classmethod
+    def load_from_file(cls, path):
+        # slotted_dataclass生成的是新类，不能用无参数的super()
+        scene = FileLoaderMixin.load_from_file.__func__(cls, path)
+        if isinstance(scene.cases, CsvCaseSource):
+            scene.cases.path = os.path.join(os.path.dirname(path), scene.cases.ref)
+        return scene
+
     @staticmethod
     def load_from_csv(path):
+        """
+            以同名json为基础，csv中的场景属性覆盖json，用例改为从csv逐行读取
+        """
         dirpath, filename = os.path.split(path)
         json_path = os.path.join(dirpath, filename.replace('.csv', '.json'))
         scene = Scene.load_from_file(json_path)
         if path.endswith('.json'):
             return scene
-        l = read_csv(path)
-        scene_attrs = {
-            '场景名': 'name',
-            'URL': 'url',
-            '用户': 'user',
-        }
-        for index, line in enumerate(l):
-            if line[0] in scene_attrs:
-                setattr(scene, scene_attrs[line[0]], line[1])
-            elif line[0] == 'CASE名':
-                break
-        cases = []
-        for line in l[index:]:
-            case_name = line[0]
-            case_params = {}
-            for _index, i in enumerate(line[1:]):
-                if _index % 2 == 0:
-                    case_params[i] = line[_index + 1]
-            cases.append(Case(
-                name=case_name,
-                params=case_params
-            ))
-        scene.cases = cases
+        lines = iter_csv(path)
+        try:
+            for line in lines:
+                if line and line[0] in SCENE_CSV_ATTRS:
+                    setattr(scene, SCENE_CSV_ATTRS[line[0]], line[1])
+                elif line and line[0] == CASE_CSV_HEADER:
+                    break
+        finally:
+            lines.close()
+        scene.cases = CsvCaseSource(path)
         return scene
 
-
     @staticmethod
     def gen_by_post_man_items(post_man_items):
         res = []
@@ -215,44 +336,155 @@ class Scene(DataClassMixin, FileLoaderMixin):
         return
 
     def get_headers(self) -> dict:
-        if self.user:
-            h = Header(description='Cookie', key='Cookie', value= self.user_cookie)
-            if self.header:
-                self.header.append(h)
-            else:
-                self.header = [h]
-        return {i.key: i.value for i in self.header} if self.header else {}
+        """
+            场景请求头，已登录时加上Cookie；不修改self.header，多次执行不会重复追加
+        """
+        headers = {i.key: i.value for i in self.header} if self.header else {}
+        if self.user and self.user_cookie:
+            headers['Cookie'] = self.user_cookie
+        return headers
 
     def get_postman_headers(self):
         return self.header
 
-    def get_response(self) -> dict:
-        res = {}
-        url = self.url
-        headers = self.get_headers()
-        for e in self.envs:
-            url = url.replace('{{%s}}' % e.key, e.value)
-            headers = {k:v.replace('{{%s}}' % e.key, e.value) for k, v in headers.items()}
+    def iter_request_args(self):
+        """
+            逐个渲染各用例的请求参数，用例来自csv时边读边渲染
+        :return: 产出(case_name, method, url, kwargs)
+        """
+        plan = self.plan
+        url = plan.render(self.url)
+        headers = plan.render_dict(self.get_headers())
+        method = 'GET' if self.method in [None, "GET"] else self.method
         for case in self.cases:
-            data = case.get_payload()
-            for e in self.envs:
-                data = {k: v.replace('{{%s}}' % e.key, e.value) for k, v in data.items()}
-            method = 'GET' if self.method in [None, "GET"] else self.method
-            logger.info('执行(%s)请求,URL为%s' % (method, url))
+            data = plan.render_dict(case.get_payload())
             if method == 'GET':
-                res[case.name] = requests.get(url, params=data, headers=headers)
+                yield case.name, method, url, {'params': data, 'headers': headers}
             else:
-                res[case.name] = requests.request(self.method or "GET", url, headers=headers, data=data)
+                yield case.name, method, url, {'data': data, 'headers': headers}
+
+    def iter_prepared(self):
+        """
+            逐个构建各用例的PreparedCase，用例来自csv时边读边构建
+        """
+        expects = self._expects
+        for index, (name, method, url, kwargs) in enumerate(self.iter_request_args()):
+            yield prepare_case(name, method, url, kwargs, expects[index] if expects else None)
+
+    def prepare(self) -> list:
+        """
+            构建各用例的PreparedCase，环境变量与cookie不变时重复执行直接复用
+            用例来自csv时不缓存，以免全部载入内存
+        :return: [PreparedCase]
+        """
+        if not isinstance(self.cases, list):
+            return list(self.iter_prepared())
+        key = (self.plan, self.user_cookie)
+        if self._prepared is None or self._prepared[0] != key:
+            self._prepared = (key, list(self.iter_prepared()))
+        return self._prepared[1]
+
+    def clear_prepared(self):
+        """
+            丢弃prepare缓存的PreparedCase，场景不再重复执行时释放内存
+        """
+        self._prepared = None
+
+    def _request_args(self):
+        names = []
+        request_args = []
+        for name, method, url, kwargs in self.iter_request_args():
+            logger.info('执行(%s)请求,URL为%s' % (method, url))
+            names.append(name)
+            request_args.append((method, url, kwargs))
+        return names, request_args
+
+    def get_response(self) -> dict:
+        res = {}
+        names, request_args = self._request_args()
+        for name, resp in zip(names, self.project.get_engine().request_all(request_args, user=self.user)):
+            res[name] = resp
         return res
 
-    def run(self):
+    def iter_responses(self):
+        """
+            每完成一个用例即产出(PreparedCase, 响应)，不必等所有用例完成
+            请求参数按需渲染，只保留在途请求的用例
+        """
+        pending = {}
+        request_start = self.project.hooks.request_start
+
+        cases = self.iter_prepared() if not isinstance(self.cases, list) else self.prepare()
+
+        def prepared():
+            for index, case in enumerate(iter_phase('render', cases)):
+                logger.info('执行(%s)请求,URL为%s' % (case.method, case.scene_url))
+                pending[index] = case
+                if request_start is not None:
+                    request_start(scene=self, case=case.name, method=case.method, url=case.scene_url)
+                yield case
+
+        # 渲染在取下一个响应时按需进行，计入render，request只剩等待网络的时间
+        for index, resp in iter_phase('request', self.project.get_engine().iter_prepared(prepared(), user=self.user)):
+            yield pending.pop(index), resp
+
+    def run(self, on_result=None) -> list:
+        """
+        :param on_result: 每完成一个用例即调用on_result(result, resp)，出错时resp为None；
+            给定on_result时结果只交给它处理，不在场景中累积，返回空列表
+        :return: 各用例的执行结果 [{'scene': xx, 'case': xx, 'status': 200, 'elapsed': 0.01, ...}]
+        """
+        results = []
+        if self.project is not None and self.user:
+            # 执行前可能已有其他场景重新登录了此用户
+            self.set_user_cookie(self.project.cookie_users.get(self.user))
+        rejected = False
+        hooks = self.project.hooks
+        request_end = hooks.request_end
+        start = time.perf_counter()
+        counts = [0, 0]     # 用例数, 出错数
+
+        def add(result, resp=None):
+            counts[0] += 1
+            if 'error' in result:
+                counts[1] += 1
+            if request_end is not None:
+                request_end(scene=self, case=result['case'], result=result, response=resp)
+            if on_result:
+                on_result(result, resp)
+            else:
+                results.append(result)
+
         try:
-            responses = self.get_response()
-            for case_name, resp in responses.items():
+            for case, resp in self.iter_responses():
+                case_name = case.name
+                if isinstance(resp, Exception):
+                    # 请求失败(超时、连接失败、host已熔断)只记为本用例出错，其余用例继续
+                    logger.error('case-' + case_name + ' request error:' + (str(resp) or type(resp).__name__))
+                    add({'scene': self.name, 'case': case_name, 'error': str(resp) or type(resp).__name__})
+                    continue
                 try:
                     logger.info('run case <%s>, get status %s, content: %s' %
                                 (self.name + case_name, resp.status_code, resp.content))
+                    result = dict({'scene': self.name, 'case': case_name, 'status': resp.status_code},
+                                  **getattr(resp, 'metrics', {}))
+                    if case.expect is not None:
+                        failures = case.expect.check(resp)
+                        if failures:
+                            logger.error('case-' + case_name + ' assertion failed:' + '；'.join(failures))
+                            result['error'] = '断言失败：' + '；'.join(failures)
+                            result['failures'] = failures
+                    add(result, resp)
+                    if not rejected and self.user_cookie and self.project.is_cookie_rejected(resp):
+                        # 本场景其余用例已按旧cookie发出，重新登录后供之后的场景使用
+                        rejected = True
+                        self.project.relogin(self.user, self.user_cookie)
                 except Exception as e2:
                     logger.error('case-' + case_name + ' run error:' + str(e2))
+                    add({'scene': self.name, 'case': case_name, 'error': str(e2)})
         except Exception as e1:
             logger.error('scene-' + self.name + ' run error:' + str(e1))
+            add({'scene': self.name, 'case': None, 'error': str(e1)})
+        if hooks.scene_end is not None:
+            hooks.scene_end(scene=self, seconds=time.perf_counter() - start, count=counts[0], errors=counts[1])
+        return results
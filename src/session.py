@@ -0,0 +1,149 @@
+"""
+    可复用(keep-alive)的requests.Session连接池
+"""
+import queue
+import threading
+from http.cookiejar import DefaultCookiePolicy
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+
+class ConnectionStats:
+    """
+        统计新建连接与复用连接的次数
+    """
+
+    def __init__(self):
+        self.opened = 0
+        self.reused = 0
+        self._lock = threading.Lock()
+
+    def record(self, opened):
+        with self._lock:
+            if opened:
+                self.opened += opened
+            else:
+                self.reused += 1
+
+    def merge(self, data):
+        with self._lock:
+            self.opened += data['opened']
+            self.reused += data['reused']
+
+    def to_dict(self) -> dict:
+        return {'opened': self.opened, 'reused': self.reused}
+
+
+_local = threading.local()
+
+
+def _count_connect():
+    _local.connects = getattr(_local, 'connects', 0) + 1
+
+
+def _connects():
+    return getattr(_local, 'connects', 0)
+
+
+class _CountingHTTPConnection(HTTPConnection):
+    def connect(self):
+        _count_connect()
+        return super().connect()
+
+
+class _CountingHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        _count_connect()
+        return super().connect()
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _CountingHTTPConnection
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _CountingHTTPSConnection
+
+
+class CountingHTTPAdapter(HTTPAdapter):
+    """
+        统计每次请求是否建立了新的TCP连接，结果记录在response.connection_reused上
+        session借出后由单个线程独占，按线程计数即可区分各次请求
+    """
+
+    def __init__(self, stats, **kwargs):
+        self.stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _CountingHTTPConnectionPool,
+            'https': _CountingHTTPSConnectionPool,
+        }
+
+    def send(self, request, **kwargs):
+        before = _connects()
+        response = super().send(request, **kwargs)
+        opened = _connects() - before
+        response.connection_reused = not opened
+        self.stats.record(opened)
+        return response
+
+
+class SessionPool:
+    """
+        按(host, user)分组的Session池，每组最多pool_size个Session，
+        每个Session对同一host最多保持max_connections个连接
+    """
+
+    def __init__(self, pool_size=4, max_connections=10):
+        self.pool_size = pool_size
+        self.max_connections = max_connections
+        self.stats = ConnectionStats()
+        self._idle = {}
+        self._created = {}
+        self._sessions = []
+        self._lock = threading.Lock()
+
+    def _new_session(self):
+        session = requests.Session()
+        # 登录态由Cookie头决定，不能让Session记住响应设置的cookie
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        adapter = CountingHTTPAdapter(self.stats, pool_connections=1, pool_maxsize=self.max_connections)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        self._sessions.append(session)
+        return session
+
+    def _acquire(self, key):
+        with self._lock:
+            idle = self._idle.setdefault(key, queue.LifoQueue())
+            try:
+                return idle, idle.get_nowait()
+            except queue.Empty:
+                pass
+            if self._created.get(key, 0) < self.pool_size:
+                self._created[key] = self._created.get(key, 0) + 1
+                return idle, self._new_session()
+        return idle, idle.get()
+
+    @contextmanager
+    def borrow(self, url, user=None):
+        idle, session = self._acquire((urlsplit(url).netloc, user))
+        try:
+            yield session
+        finally:
+            idle.put(session)
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions:
+                session.close()
+            self._sessions = []
+            self._idle = {}
+            self._created = {}
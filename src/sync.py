@@ -0,0 +1,51 @@
+"""
+    json与csv用例文件的同步清单
+    记录每对文件的内容hash及上次由哪一侧生成，同步时只处理来源一侧有变化的文件对
+"""
+import os
+from .utils import read_json_file, save_json_file
+
+
+class SyncManifest:
+    """
+        {json文件绝对路径: {'json': hash, 'csv': hash, 'source': 'json'|'csv'}}，文件不存在时hash为None
+    """
+    manifest_name = 'sync_manifest.json'
+
+    def __init__(self, root):
+        self.root = root
+        self._entries = None
+        self._changed = {}
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.root, self.manifest_name)
+
+    def _read(self) -> dict:
+        return read_json_file(self.manifest_path, 'sync manifest')
+
+    def unchanged(self, json_path, source, json_hash, csv_hash):
+        """
+            上次同样由source一侧生成，且两侧文件都没有变化
+        """
+        if self._entries is None:
+            self._entries = self._read()
+        entry = self._entries.get(os.path.abspath(json_path))
+        return entry == {'json': json_hash, 'csv': csv_hash, 'source': source}
+
+    def record(self, json_path, source, json_hash, csv_hash):
+        if self._entries is None:
+            self._entries = self._read()
+        entry = {'json': json_hash, 'csv': csv_hash, 'source': source}
+        self._entries[os.path.abspath(json_path)] = entry
+        self._changed[os.path.abspath(json_path)] = entry
+
+    def save(self):
+        """
+            合并磁盘上的清单后原子替换，并清除json文件已删除的条目
+        """
+        if not self._changed:
+            return
+        self._entries = save_json_file(self.manifest_path, self._changed,
+                                       keep=lambda path, entry: os.path.exists(path), name='sync manifest')
+        self._changed = {}
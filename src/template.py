@@ -0,0 +1,79 @@
+"""
+    环境变量模板：{{key}}
+    场景在set_project时编译一次，之后每次渲染只需一次拼接
+"""
+import re
+from functools import lru_cache
+
+PLACEHOLDER = re.compile(r'\{\{(.*?)\}\}')
+RENDER_CACHE_SIZE = 1024    # 编译时没有见过的模板(如csv行中的参数)最多缓存的渲染结果数
+
+
+class Template:
+    """
+        编译后的模板，literals与keys交替排列：literals[0] keys[0] literals[1] keys[1] ... literals[-1]
+    """
+    __slots__ = ('text', 'literals', 'keys')
+
+    def __init__(self, text):
+        parts = PLACEHOLDER.split(text)
+        self.text = text
+        self.literals = parts[0::2]
+        self.keys = parts[1::2]
+
+    def render(self, values: dict) -> str:
+        literals = self.literals
+        res = [literals[0]]
+        for index, key in enumerate(self.keys):
+            value = values.get(key)
+            # 未定义的变量原样保留
+            res.append('{{%s}}' % key if value is None else str(value))
+            res.append(literals[index + 1])
+        return ''.join(res)
+
+
+class RenderPlan:
+    """
+        一个场景的渲染计划，url、header、params中出现的模板在编译时全部解析并缓存渲染结果；
+        编译时没有见过的模板(数据驱动时csv行中的参数)按LRU最多缓存RENDER_CACHE_SIZE个，内存不随行数增长
+    """
+
+    def __init__(self, envs):
+        self.values = {e.key: e.value for e in envs}
+        self.unknown = set()
+        self._rendered = {}
+        self._render_uncompiled = lru_cache(maxsize=RENDER_CACHE_SIZE)(self._render_text)
+
+    def _render_text(self, text):
+        template = Template(text)
+        self.unknown.update(k for k in template.keys if k not in self.values)
+        return template.render(self.values)
+
+    def compile(self, text):
+        if not isinstance(text, str) or '{{' not in text or text in self._rendered:
+            return
+        self._rendered[text] = self._render_text(text)
+
+    def compile_scene(self, scene):
+        self.compile(scene.url)
+        for header in scene.header or []:
+            self.compile(header.value)
+        if isinstance(scene.cases, list):
+            for case in scene.cases:
+                for value in case.params.values():
+                    self.compile(value)
+
+    def render(self, value):
+        """
+            非字符串的值原样返回
+        """
+        if not isinstance(value, str) or '{{' not in value:
+            return value
+        rendered = self._rendered.get(value)
+        if rendered is None:
+            return self._render_uncompiled(value)
+        return rendered
+
+    def render_dict(self, data: dict) -> dict:
+        render = self.render
+        return {k: render(v) for k, v in data.items()}
@@ -1,24 +1,137 @@
+import io
+import os
 import csv
+import json
 import codecs
 import logging
+import tempfile
+import threading
+from contextlib import contextmanager
 
 logger = logging.getLogger('webapitest')
+_local = threading.local()
+_flush_lock = threading.Lock()
+GROUPED_LOG_LIMIT = 200     # 暂存的日志达到该条数即先输出，用例很多的场景不会把全部日志(含响应体)留在内存中
 
 
-def write_csv(csv_path, data):
-    f = codecs.open(csv_path, 'w', 'utf_8_sig')
+def _flush_records(records):
+    with _flush_lock:
+        for record in records:
+            logger.handle(record)
+
+
+class _GroupedLogFilter(logging.Filter):
+    """
+        当前线程处于grouped_logs中时，暂存日志记录，不直接输出
+    """
+    def filter(self, record):
+        buffer = getattr(_local, 'buffer', None)
+        if buffer is None:
+            return True
+        buffer.append(record)
+        if len(buffer) >= GROUPED_LOG_LIMIT:
+            _local.buffer = None
+            try:
+                _flush_records(buffer)
+            finally:
+                _local.buffer = []
+        return False
+
+
+logger.addFilter(_GroupedLogFilter())
+
+
+@contextmanager
+def grouped_logs():
+    """
+        并发执行场景时，将同一场景的日志集中输出，避免不同场景的日志交错
+        每GROUPED_LOG_LIMIT条输出一次，日志很多的场景分段集中输出
+    """
+    _local.buffer = []
+    try:
+        yield
+    finally:
+        records, _local.buffer = _local.buffer, None
+        _flush_records(records)
+
+
+def dump_csv(data) -> bytes:
+    """
+        与write_csv写入文件的内容一致：带BOM的utf-8
+    """
+    f = io.StringIO()
     csv_writer = csv.writer(f)
     for line in data:
         csv_writer.writerow(line)
+    return codecs.BOM_UTF8 + f.getvalue().encode('utf-8')
+
+
+def write_csv(csv_path, data):
+    f = open(csv_path, 'wb')
+    f.write(dump_csv(data))
     f.close()
 
 
+def iter_csv(path: str):
+    """
+        逐行读取csv，兼容write_csv写入的BOM
+    """
+    f = open(path, 'r', encoding='utf_8_sig', newline='')
+    try:
+        yield from csv.reader(f)
+    finally:
+        f.close()
+
+
 def read_csv(path: str) -> list:
-    data = []
-    f = open(path, 'r')
-    reader = csv.reader(f)
-    content = next(reader)
-    for line in content:
-        data.append(line)
-    f.close()
-    return data
+    return list(iter_csv(path))
+
+
+def atomic_write(path, content: bytes, mode=None):
+    """
+        先写同目录下的临时文件再改名，其它进程不会读到写了一半的文件
+    :param mode: 文件权限，None时保持mkstemp的仅当前用户可读写
+    """
+    dirpath, filename = os.path.split(path)
+    fd, tmp_path = tempfile.mkstemp(dir=dirpath or None, prefix='.%s.' % filename, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        if mode is not None:
+            os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def read_json_file(path, name='json file') -> dict:
+    """
+        读取cache_dir下的记录文件，文件不存在或已损坏时返回空字典
+    :param name: 出错时日志中的文件说明
+    """
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.info('%s error: %s, message: %s' % (name, path, str(e)))
+    return {}
+
+
+def save_json_file(path, changed, keep=None, name='json file') -> dict:
+    """
+        把本次变化的条目合并进磁盘上的记录后原子替换，多个进程同时保存时互不覆盖
+    :param changed: {键: 条目}，条目为None表示删除
+    :param keep: keep(键, 条目)为False的条目不写入
+    :return: 写入的全部条目
+    """
+    entries = read_json_file(path, name)
+    entries.update(changed)
+    entries = {key: entry for key, entry in entries.items()
+               if entry is not None and (keep is None or keep(key, entry))}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    atomic_write(path, json.dumps(entries, indent=4, ensure_ascii=False).encode('utf-8'))
+    return entries
@@ -0,0 +1,182 @@
+"""
+    批量生成文件：内容未变化的文件不重写，写入先写临时文件再改名，写文件交给线程池
+"""
+import os
+import json
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .profiler import phase
+from .utils import atomic_write
+
+
+def _read_umask():
+    # umask是进程级的，只能先设置再恢复；只在导入时读取一次，以免写文件线程在这期间以0666创建文件
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+
+# 生成的文件与直接open创建的权限一致，而不是mkstemp的0600
+DEFAULT_MODE = 0o666 & ~_read_umask()
+
+
+def file_digest(path):
+    f = open(path, 'rb')
+    try:
+        return hashlib.sha256(f.read()).hexdigest()
+    finally:
+        f.close()
+
+
+MANIFEST_NAME = '.webapitest_generated'
+
+
+class CaseFileWriter:
+    """
+        with CaseFileWriter(root, workers=4, prune=True) as writer:
+            writer.write(path, content)
+        退出时等待全部写完，并把root下生成的文件记入清单root/.webapitest_generated；
+        prune为True时只删除上次清单里有、本次没有生成的文件，手写文件和隐藏文件不受影响
+    """
+
+    def __init__(self, root=None, workers=4, prune=False, suffix='.json'):
+        self.root = root
+        self.prune = prune
+        self.suffix = suffix
+        self.written = 0
+        self.skipped = 0
+        self.removed = 0
+        self._paths = set()
+        self._futures = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='webapitest-writer') \
+            if workers > 1 else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close(complete=exc_type is None)
+
+    def write(self, path, content):
+        """
+        :param content: str按utf-8编码写入
+        """
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        path = os.path.abspath(path)
+        with self._lock:
+            self._paths.add(path)
+        if self._executor:
+            if len(self._futures) >= 1000:
+                self._collect()
+            self._futures.append(self._executor.submit(self._write, path, content))
+        else:
+            self._write(path, content)
+
+    def _unchanged(self, path, content):
+        try:
+            if os.stat(path).st_size != len(content):
+                return False
+            return file_digest(path) == hashlib.sha256(content).hexdigest()
+        except FileNotFoundError:
+            return False
+
+    def _write(self, path, content):
+        with phase('write'):
+            self._write_file(path, content)
+
+    def _write_file(self, path, content):
+        if self._unchanged(path, content):
+            with self._lock:
+                self.skipped += 1
+            return
+        self._replace(path, content)
+        with self._lock:
+            self.written += 1
+
+    @staticmethod
+    def _replace(path, content):
+        atomic_write(path, content, DEFAULT_MODE)
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.root, MANIFEST_NAME)
+
+    def _load_manifest(self) -> set:
+        """
+        :return: 上次生成的文件(绝对路径)，没有清单时为空
+        """
+        try:
+            f = open(self.manifest_path, encoding='utf-8')
+        except FileNotFoundError:
+            return set()
+        try:
+            paths = json.load(f)
+        except ValueError:
+            return set()
+        finally:
+            f.close()
+        root = os.path.abspath(self.root)
+        return {os.path.normpath(os.path.join(root, path)) for path in paths}
+
+    def _save_manifest(self, paths):
+        root = os.path.abspath(self.root)
+        content = json.dumps(sorted(os.path.relpath(path, root) for path in paths), ensure_ascii=False, indent=0)
+        content = content.encode('utf-8')
+        if not self._unchanged(self.manifest_path, content):
+            self._replace(self.manifest_path, content)
+
+    @staticmethod
+    def _is_hidden(root, path):
+        return any(part.startswith('.') for part in os.path.relpath(path, root).split(os.sep))
+
+    def _finish(self, prune):
+        """
+            prune时删除上次生成、本次没有生成的文件；不prune时仍存在的旧文件保留在清单里，供以后prune
+        """
+        root = os.path.abspath(self.root)
+        generated = {path for path in self._paths
+                     if path.startswith(root + os.sep) and not self._is_hidden(root, path)}
+        stale = self._load_manifest() - generated
+        for path in sorted(stale):
+            if not path.startswith(root + os.sep) or self._is_hidden(root, path) or not path.endswith(self.suffix):
+                continue
+            if not os.path.isfile(path):
+                continue
+            if prune:
+                os.remove(path)
+                self.removed += 1
+            else:
+                generated.add(path)
+        self._save_manifest(generated)
+
+    def _collect(self, wait=False):
+        """
+            取出已完成的写入，有异常时抛出
+        """
+        pending = []
+        for future in self._futures:
+            if wait or future.done():
+                future.result()
+            else:
+                pending.append(future)
+        self._futures = pending
+
+    def close(self, complete=True):
+        """
+        :param complete: 生成是否完整，不完整(出错退出)时不更新清单也不删除文件
+        """
+        try:
+            with phase('wait'):
+                self._collect(wait=True)
+        finally:
+            self._futures = []
+            if self._executor:
+                self._executor.shutdown()
+        if complete and self.root:
+            self._finish(self.prune)
+
+    def to_dict(self) -> dict:
+        return {'written': self.written, 'skipped': self.skipped, 'removed': self.removed}